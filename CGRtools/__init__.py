@@ -21,6 +21,7 @@ from .containers import *
 from .files import *
 from .preparer import *
 from .reactor import *
+from .search import *
 from .utils import *
 
 
@@ -66,4 +66,33 @@ def lazy_product(*args):
             yield tuple(p[x] for x, p in zip(ind, pools))
 
 
-__all__ = ['lazy_product']
+class LazyCache:
+    """
+    Lazy cached iterator. Each iteration replays already generated values and continues source.
+    """
+    __slots__ = ('_source', '_cache')
+
+    def __init__(self, source):
+        self._source = iter(source)
+        self._cache = []
+
+    def __iter__(self):
+        cache = self._cache
+        i = 0
+        while True:
+            if i == len(cache):
+                if self._source is None:
+                    return
+                try:
+                    cache.append(next(self._source))
+                except StopIteration:
+                    self._source = None
+                    return
+            yield cache[i]
+            i += 1
+
+    def __bool__(self):
+        return next(iter(self), None) is not None
+
+
+__all__ = ['lazy_product', 'LazyCache']
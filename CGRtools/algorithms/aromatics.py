@@ -19,6 +19,7 @@
 from collections import defaultdict, deque
 from typing import List, Optional, Tuple
 from .._functions import lazy_product
+from ..containers.bonds import Bond
 from ..exceptions import InvalidAromaticRing
 
 
@@ -73,13 +74,13 @@ class Aromatize:
         for ring in rings:
             seen.update(ring)
             n, *_, m = ring
-            bonds[n][m]._Bond__order = 4
+            bonds[n][m] = bonds[m][n] = Bond(4)
             for n, m in zip(ring, ring[1:]):
-                bonds[n][m]._Bond__order = 4
+                bonds[n][m] = bonds[m][n] = Bond(4)
         for n in seen:
             sh[n] = 4
 
-        self.flush_cache()
+        self.flush_cache(keep_topology=True)
         self._fix_stereo()  # check if any stereo centers vanished.
         return True
 
@@ -94,7 +95,7 @@ class Aromatize:
         kekule = next(self.__kekule_full(), None)
         if kekule:
             self.__kekule_patch(kekule)
-            self.flush_cache()
+            self.flush_cache(keep_topology=True)
             return True
         return False
 
@@ -279,7 +280,7 @@ class Aromatize:
         bonds = self._bonds
         atoms = set()
         for n, m, b in patch:
-            bonds[n][m]._Bond__order = b
+            bonds[n][m] = bonds[m][n] = Bond(b)
             atoms.add(n)
             atoms.add(m)
         for n in atoms:
@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+from time import monotonic
+from typing import Optional
+from ..exceptions import SearchInterrupted
+
+
+check_period = 0x3ff  # nodes between time and cancellation checks. mask of 2 ** k - 1 form
+
+
+class SearchBudget:
+    """
+    Limits and statistics of graph searches. One budget can be shared by several searches of one request::
+
+        budget = SearchBudget(timeout=5, max_nodes=10 ** 6, cancel=threading.Event())
+        for mapping in query.get_mapping(molecule, budget=budget):
+            ...
+        budget.nodes, budget.backtracks, budget.elapsed
+
+    By default searches raise `SearchInterrupted` on limits expiry or cancellation.
+    In partial mode searches stop silently and results found before expiry are returned.
+    """
+    __slots__ = ('timeout', 'max_nodes', 'cancel', 'partial', 'nodes', 'backtracks', 'expired', '__start',
+                 '__deadline')
+
+    def __init__(self, timeout: Optional[float] = None, max_nodes: Optional[int] = None, cancel=None,
+                 partial: bool = False):
+        """
+        :param timeout: seconds from budget creation
+        :param max_nodes: maximal number of explored search nodes
+        :param cancel: cooperative cancellation token. Any object with `is_set()` method, e.g. `threading.Event`
+        :param partial: stop search without error on expiry
+        """
+        if timeout is not None and timeout <= 0:
+            raise ValueError('timeout should be positive')
+        if max_nodes is not None and max_nodes < 1:
+            raise ValueError('max_nodes should be positive')
+        self.timeout = timeout
+        self.max_nodes = max_nodes
+        self.cancel = cancel
+        self.partial = partial
+        self.nodes = 0
+        self.backtracks = 0
+        self.expired: Optional[str] = None  # reason of interruption: timeout, nodes or cancelled
+        self.__start = monotonic()
+        self.__deadline = None if timeout is None else self.__start + timeout
+
+    @classmethod
+    def from_kwargs(cls, budget: Optional['SearchBudget'], timeout: Optional[float], max_nodes: Optional[int],
+                    cancel) -> Optional['SearchBudget']:
+        """
+        Budget for searches API arguments. Limits arguments ignored if budget given.
+        """
+        if budget is not None:
+            return budget
+        if timeout is None and max_nodes is None and cancel is None:
+            return
+        return cls(timeout, max_nodes, cancel)
+
+    @property
+    def elapsed(self) -> float:
+        """
+        Seconds from budget creation
+        """
+        return monotonic() - self.__start
+
+    def visit(self, period: int = check_period) -> bool:
+        """
+        Count search node. Return False if search should be stopped.
+
+        :param period: nodes between time and cancellation checks as mask of 2 ** k - 1 form.
+            Searches with costly nodes should check more often.
+        """
+        if self.expired:
+            return self.__expire(self.expired)
+        self.nodes += 1
+        if self.max_nodes is not None and self.nodes > self.max_nodes:
+            return self.__expire('nodes')
+        if not self.nodes & period:
+            return self.check()
+        return True
+
+    def backtrack(self):
+        """
+        Count search backtrack
+        """
+        self.backtracks += 1
+
+    def check(self) -> bool:
+        """
+        Test time and cancellation without nodes counting. Return False if search should be stopped.
+        """
+        if self.expired:
+            return self.__expire(self.expired)
+        if self.__deadline is not None and monotonic() > self.__deadline:
+            return self.__expire('timeout')
+        if self.cancel is not None and self.cancel.is_set():
+            return self.__expire('cancelled')
+        return True
+
+    def __expire(self, reason):
+        self.expired = reason
+        if self.partial:
+            return False
+        raise SearchInterrupted(reason)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(nodes={self.nodes}, backtracks={self.backtracks}, ' \
+               f'elapsed={self.elapsed:.3f}, expired={self.expired})'
+
+
+__all__ = ['SearchBudget']
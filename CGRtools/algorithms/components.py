@@ -121,7 +121,39 @@ class GraphComponents:
         """
         Atoms in rings
         """
-        return tuple({x for x in self.sssr for x in x})
+        if 'sssr' in self.__dict__:
+            return tuple({x for x in self.sssr for x in x})
+        # atoms of not bridge bonds. linear Tarjan's search instead of sssr
+        bonds = self._skin_graph(self._bonds)
+        depth = {}
+        low = {}
+        rings = set()
+        for root in bonds:
+            if root in depth:
+                continue
+            depth[root] = low[root] = 0
+            stack = [(root, None, iter(bonds[root]))]
+            while stack:
+                n, parent, ms = stack[-1]
+                for m in ms:
+                    if m == parent:
+                        continue
+                    elif m in depth:  # back edge
+                        if depth[m] < low[n]:
+                            low[n] = depth[m]
+                    else:
+                        depth[m] = low[m] = depth[n] + 1
+                        stack.append((m, n, iter(bonds[m])))
+                        break
+                else:
+                    stack.pop()
+                    if parent is not None:
+                        if low[n] < low[parent]:
+                            low[parent] = low[n]
+                        if low[n] <= depth[parent]:  # not bridge
+                            rings.add(n)
+                            rings.add(parent)
+        return tuple(rings)
 
     @cached_property
     def rings_count(self):
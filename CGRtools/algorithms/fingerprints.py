@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+from CachedMethods import cached_args_method
+from collections import defaultdict
+from importlib.util import find_spec
+from typing import Dict, Iterable, Union
+from .morgan import tuple_hash
+
+
+if find_spec('numpy'):
+    from numpy import frombuffer, uint8, uint16, uint64, unpackbits, zeros
+
+
+class Fingerprints:
+    __slots__ = ()
+
+    def fingerprint(self, radius: int = 2, size: int = 2048, *, counts: bool = False) -> Union[int, Dict[int, int]]:
+        """
+        Circular (ECFP like) fingerprint. Atoms environments up to radius identified by Morgan like iterations.
+
+        :param radius: maximal radius of atoms environments
+        :param size: length of folded bit vector
+        :param counts: return environments counts of bits instead of bit vector
+        :return: bit vector as int or dict of bits counts
+        """
+        return _fold(self._circular_features(radius), size, counts)
+
+    @cached_args_method
+    def _circular_features(self, radius: int) -> Dict[int, int]:
+        """
+        Unfolded environments identifiers with counts. Identifiers stable between python sessions.
+        """
+        if radius < 0:
+            raise ValueError('radius should be non-negative')
+        bonds = self._bonds
+        weights = self._fingerprint_invariants()
+        features = defaultdict(int)
+        for w in weights.values():
+            features[w] += 1
+        for r in range(1, radius + 1):
+            weights = {n: tuple_hash((r, weights[n], *(x for x in sorted((hash(b), weights[m])
+                                                                        for m, b in ms.items()) for x in x)))
+                       for n, ms in bonds.items()}
+            for w in weights.values():
+                features[w] += 1
+        return dict(features)
+
+    def _fingerprint_invariants(self) -> Dict[int, int]:
+        """
+        Initial atoms identifiers: atom labels, neighbors count and ring membership.
+        """
+        bonds = self._bonds
+        rings = set(self.ring_atoms)
+        return {n: tuple_hash((hash(a), len(bonds[n]), n in rings)) for n, a in self._atoms.items()}
+
+
+class MoleculeFingerprints(Fingerprints):
+    __slots__ = ()
+
+    def _fingerprint_invariants(self) -> Dict[int, int]:
+        bonds = self._bonds
+        hydrogens = self._hydrogens
+        rings = set(self.ring_atoms)
+        return {n: tuple_hash((hash(a), len(bonds[n]), n in rings, -1 if hydrogens[n] is None else hydrogens[n]))
+                for n, a in self._atoms.items()}
+
+
+class CGRFingerprints(Fingerprints):
+    __slots__ = ()
+
+    def center_fingerprint(self, radius: int = 2, size: int = 2048, *, counts: bool = False) -> \
+            Union[int, Dict[int, int]]:
+        """
+        Reaction center fingerprint. Dynamic environments of center atoms up to radius hashed.
+        Suitable for reactions similarity by transformation instead of whole structures.
+
+        :param radius: maximal radius of center atoms environments
+        :param size: length of folded bit vector
+        :param counts: return environments counts of bits instead of bit vector
+        :return: bit vector as int or dict of bits counts
+        """
+        return _fold(self._center_features(radius), size, counts)
+
+    @cached_args_method
+    def _center_features(self, radius: int) -> Dict[int, int]:
+        """
+        Unfolded center atoms environments identifiers with counts.
+        """
+        if radius < 0:
+            raise ValueError('radius should be non-negative')
+        center = self.center_atoms
+        if not center:
+            return {}
+        bonds = self._bonds
+        weights = self._fingerprint_invariants()
+        features = defaultdict(int)
+        for n in center:
+            features[weights[n]] += 1
+        layers = [set(center)]  # atoms in distance up to k from center
+        for _ in range(radius):
+            layers.append(layers[-1].union(*(bonds[n] for n in layers[-1])))
+        for r in range(1, radius + 1):  # only atoms affecting center environments updated
+            weights = {n: tuple_hash((r, weights[n], *(x for x in sorted((hash(b), weights[m])
+                                                                        for m, b in bonds[n].items()) for x in x)))
+                       for n in layers[radius - r]}
+            for n in center:
+                features[weights[n]] += 1
+        return dict(features)
+
+
+class ReactionFingerprints:
+    __slots__ = ()
+
+    def fingerprint(self, radius: int = 2, size: int = 2048, *, counts: bool = False) -> Union[int, Dict[int, int]]:
+        """
+        Circular fingerprint of reactants and products. Environments of reactants and products hashed separately.
+        Reagents ignored.
+
+        :param radius: maximal radius of atoms environments
+        :param size: length of folded bit vector
+        :param counts: return environments counts of bits instead of bit vector
+        :return: bit vector as int or dict of bits counts
+        """
+        return _fold(self._circular_features(radius), size, counts)
+
+    def _circular_features(self, radius: int) -> Dict[int, int]:
+        features = defaultdict(int)
+        for role, ms in enumerate((self.reactants, self.products)):
+            for m in ms:
+                for h, c in m._circular_features(radius).items():
+                    features[tuple_hash((role, h))] += c
+        return dict(features)
+
+    def center_fingerprint(self, radius: int = 2, size: int = 2048, *, counts: bool = False) -> \
+            Union[int, Dict[int, int]]:
+        """
+        Reaction center fingerprint of reaction CGR. See `CGRContainer.center_fingerprint`.
+
+        :param radius: maximal radius of center atoms environments
+        :param size: length of folded bit vector
+        :param counts: return environments counts of bits instead of bit vector
+        :return: bit vector as int or dict of bits counts
+        """
+        return _fold(self._center_features(radius), size, counts)
+
+    def _center_features(self, radius: int) -> Dict[int, int]:
+        return self.compose()._center_features(radius)
+
+
+def fingerprints_matrix(structures: Iterable, radius: int = 2, size: int = 2048, *, counts: bool = False,
+                        packed: bool = False, center: bool = False):
+    """
+    Fingerprints of molecules, CGRs or reactions in numpy matrix. Suitable for ML featurization.
+
+    :param radius: maximal radius of atoms environments
+    :param size: length of folded bit vector
+    :param counts: fill matrix by bits counts. uint16 matrix of shape (structures, size) returned
+    :param packed: pack bits into uint64 words. Bit i stored in word i // 64 as bit i % 64.
+        Matrix of shape (structures, ceil(size / 64)) returned. Counts ignored
+    :param center: reaction center fingerprints of CGRs or reactions
+    :return: uint8 matrix of bits of shape (structures, size) by default
+    """
+    if size < 1:
+        raise ValueError('size should be positive')
+    if center:
+        features = (s._center_features(radius) for s in structures)
+    else:
+        features = (s._circular_features(radius) for s in structures)
+    if counts and not packed:
+        rows = [_fold(f, size, True) for f in features]
+        matrix = zeros((len(rows), size), dtype=uint16)
+        for row, bits in zip(matrix, rows):
+            for h, c in bits.items():
+                row[h] = min(c, 0xffff)
+        return matrix
+
+    words = (size + 63) // 64
+    packs = b''.join(_fold(f, size, False).to_bytes(words * 8, 'little') for f in features)
+    if packed:
+        return frombuffer(packs, dtype='<u8').astype(uint64).reshape(-1, words)
+    matrix = frombuffer(packs, dtype=uint8).reshape(-1, words * 8)
+    return unpackbits(matrix, axis=1, bitorder='little')[:, :size]
+
+
+def _fold(features: Dict[int, int], size: int, counts: bool) -> Union[int, Dict[int, int]]:
+    if size < 1:
+        raise ValueError('size should be positive')
+    if counts:
+        bits = defaultdict(int)
+        for h, c in features.items():
+            bits[h % size] += c
+        return dict(bits)
+    bits = 0
+    for h in features:
+        bits |= 1 << h % size
+    return bits
+
+
+__all__ = ['Fingerprints', 'MoleculeFingerprints', 'CGRFingerprints', 'ReactionFingerprints']
+if find_spec('numpy'):
+    __all__.append('fingerprints_matrix')
@@ -18,12 +18,23 @@
 #
 from abc import abstractmethod
 from CachedMethods import cached_property
-from collections import defaultdict
+from collections import Counter, defaultdict
+from concurrent.futures import Executor, Future
+from importlib.util import find_spec
 from itertools import permutations
-from typing import Dict, Iterator, Any
-from .._functions import lazy_product
+from operator import eq
+from typing import Dict, Iterable, Iterator, Any, List, Optional, Tuple
+from .budget import SearchBudget
+from .symmetry import automorphism_group, automorphism_orbits, symmetry_constraints
+from .._functions import LazyCache, lazy_product
 
 
+if find_spec('numpy'):
+    from numpy import array, bincount, flatnonzero, int64, logical_or, zeros
+    matrix_threshold = 64  # minimal target component size matched by numpy compatibility matrices
+else:  # disable matrices
+    matrix_threshold = None
+
 frequency = {1: 10,  # H
              6: 9,  # C
              8: 8,  # O
@@ -36,10 +47,24 @@ frequency = {1: 10,  # H
              11: 1, 12: 1, 19: 1, 20: 1}  # Na, Mag,  K, Ca
 
 
+screen_size = 1023  # fingerprint bits mask
+screen_depth = 9  # paths up to 4 bonds. atoms and bonds interleaved
+
+
 def atom_frequency(x):
     return frequency.get(x.atomic_number, 0)
 
 
+def atom_match(masks, signature):
+    """
+    Test atom signature matches any of (mask, value) alternatives of query atom
+    """
+    for mask, value in masks:
+        if signature & mask == value:
+            return True
+    return False
+
+
 class Isomorphism:
     __slots__ = ()
 
@@ -63,8 +88,11 @@ class Isomorphism:
         """
         Test self is substructure of other
         """
+        if not self._screen(other):
+            return False
+        # any mapping proves. Morgan order of other and automorphisms filtering are useless
         try:
-            next(self.get_mapping(other))
+            next(self.get_mapping(other, automorphism_filter=False, optimize=False))
         except StopIteration:
             return False
         return True
@@ -73,7 +101,7 @@ class Isomorphism:
         """
         Test self is same structure as other
         """
-        if len(self) != len(other):
+        if len(self) != len(other) or not self._screen(other):
             return False
         try:
             next(self.get_mapping(other))
@@ -82,17 +110,29 @@ class Isomorphism:
         return True
 
     @abstractmethod
-    def get_mapping(self, other, *, automorphism_filter: bool = True,
-                    optimize: bool = True, fallback: bool = False) -> Iterator[Dict[int, int]]:
+    def get_mapping(self, other, *, automorphism_filter: bool = True, optimize: bool = True, fallback: bool = False,
+                    plan: Optional['QueryPlan'] = None, timeout: Optional[float] = None,
+                    max_nodes: Optional[int] = None, cancel=None, budget: Optional[SearchBudget] = None,
+                    executor: Optional[Executor] = None) -> Iterator[Dict[int, int]]:
         """
         Get self to other substructure mapping generator.
 
         :param automorphism_filter: Skip matches to same atoms.
         :param optimize: Morgan weights based automorphism preventing.
         :param fallback: Try without optimization then nothing matched.
+        :param plan: Precompiled search plan of self. See `compile_query`.
+        :param timeout: search time limit in seconds. `SearchInterrupted` raised on expiry.
+        :param max_nodes: search nodes limit. `SearchInterrupted` raised on expiry.
+        :param cancel: cooperative cancellation token with `is_set()` method, e.g. `threading.Event`.
+        :param budget: search limits and statistics. Overrides timeout, max_nodes and cancel. See `SearchBudget`.
+        :param executor: thread or process pool for components searches. Each pair of query and target components
+            searched independently in pool. Budget should be picklable for process pools.
         """
+        if plan is not None and plan.query is not self:
+            raise ValueError('plan compiled for other query')
+        budget = SearchBudget.from_kwargs(budget, timeout, max_nodes, cancel)
         if optimize:
-            g = self.__components_mapping(other, other.atoms_order, automorphism_filter)
+            g = self.__components_mapping(other, other.atoms_order, automorphism_filter, False, plan, budget, executor)
             m = next(g, None)
             if m is not None:
                 yield m
@@ -100,17 +140,212 @@ class Isomorphism:
                 return
             elif not fallback:
                 return
-        yield from self.__components_mapping(other, {n: i for i, n in enumerate(other)}, automorphism_filter)
+        # unique order of atoms. symmetric mappings can be pruned in search.
+        yield from self.__components_mapping(other, {n: i for i, n in enumerate(other)}, automorphism_filter,
+                                             automorphism_filter, plan, budget, executor)
 
-    def __components_mapping(self, other, o_order, automorphism_filter):
-        components, closures = self.__compiled_query
-        o_atoms = other._atoms
-        o_bonds = other._bonds
+    @property
+    def _atoms_signatures(self) -> Optional[Dict[int, int]]:
+        """
+        Bit-packed integer signatures of atoms. Used instead of atoms objects for fast matching.
+        None if structure can't be matched by signatures.
+        """
+        return None
+
+    @property
+    def _atoms_masks(self) -> Optional[Dict[int, Tuple[Tuple[int, int], ...]]]:
+        """
+        Alternatives of (mask, value) pairs of query atoms. Atom matched if signature & mask == value.
+        None if structure can't be matched by signatures.
+        """
+        return None
+
+    @cached_property
+    def _bonds_signatures(self) -> Dict[int, Dict[int, int]]:
+        """
+        Integer representation of bonds
+        """
+        return {n: {m: int(b) for m, b in mb.items()} for n, mb in self._bonds.items()}
+
+    @cached_property
+    def _automorphism_group(self):
+        """
+        Base and strong generators of automorphism group of atoms masks and bonds signatures.
+        """
+        masks = self._atoms_masks
+        if masks is None:
+            return (), ()
+        return automorphism_group(masks, self._bonds_signatures)
+
+    @property
+    def automorphism_generators(self) -> Tuple[Dict[int, int], ...]:
+        """
+        Generators of automorphism group. Each generator is mapping of moved atoms.
+        """
+        return tuple(g for _, g in self._automorphism_group[1])
+
+    @cached_property
+    def automorphism_orbits(self) -> Tuple[Tuple[int, ...], ...]:
+        """
+        Symmetry classes of atoms: orbits of automorphism group.
+        """
+        return automorphism_orbits(self._atoms, self._automorphism_group[1])
+
+    @cached_property
+    def _symmetry_constraints(self):
+        """
+        Pairs of atoms. Only one of symmetric mappings has ordered images of all pairs.
+        """
+        return symmetry_constraints(*self._automorphism_group)
+
+    @cached_property
+    def _signatures_arrays(self):
+        """
+        Atoms signatures, skin atoms mask and bonds edges grouped by signatures in numpy arrays.
+        Used for compatibility matrices matching.
+        """
+        atoms = list(self._atoms_signatures)
+        mapping = {n: i for i, n in enumerate(atoms)}
+        skin = zeros(len(atoms), dtype=bool)
+        skin[[mapping[n] for n in self.skin_atoms]] = True
+
+        src = []
+        dst = []
+        labels = []
+        for n, mb in self._bonds_signatures.items():
+            i = mapping[n]
+            for m, b in mb.items():
+                src.append(i)
+                dst.append(mapping[m])
+                labels.append(b)
+        src = array(src, dtype=int64)
+        dst = array(dst, dtype=int64)
+        labels = array(labels, dtype=int64)
+        edges = {}
+        for b in set(labels.tolist()):
+            selected = labels == b
+            edges[b] = (src[selected], dst[selected])
+        return atoms, mapping, array(list(self._atoms_signatures.values()), dtype=int64), skin, edges
+
+    @property
+    def _screen_mask(self) -> int:
+        """
+        Bits of atoms signatures used as atoms keys in screening fingerprints. 0 if screening unsupported.
+        """
+        return 0
+
+    @cached_property
+    def _screen_keys(self) -> Dict[int, int]:
+        """
+        Atoms keys of screening. Query atoms with undefined key (e.g. any element) skipped.
+        """
+        mask = self._screen_mask
+        keys = {}
+        for n, alternatives in self._atoms_masks.items():
+            m, v = alternatives[0]
+            v &= mask
+            if all(m & mask == mask and x & mask == v for m, x in alternatives):
+                keys[n] = v
+        return keys
+
+    @cached_property
+    def _screen_counts(self) -> Tuple[Dict[int, int], int, int, int]:
+        """
+        Cheap part of screening fingerprint: atoms keys counts, atoms, bonds and rings counts.
+        """
+        counts = defaultdict(int)
+        for k in self._screen_keys.values():
+            counts[k] += 1
+        return dict(counts), len(self._atoms), self.bonds_count, self.rings_count
+
+    @cached_property
+    def _screen_fingerprint(self) -> Tuple[int, Dict[int, int], int, int, int]:
+        """
+        Substructure screening fingerprint: hashed linear paths bits, atoms keys counts, atoms, bonds and rings counts.
+        Paths over query atoms with undefined key skipped.
+        """
+        keys = self._screen_keys
+        bonds = self._bonds_signatures
+        bits = 0
+        for n, k in keys.items():
+            stack = [(n, (k,), {n})]
+            while stack:
+                n, path, seen = stack.pop()
+                bits |= 1 << (hash(min(path, path[::-1])) & screen_size)
+                if len(path) == screen_depth:
+                    continue
+                for m, b in bonds[n].items():
+                    if m not in seen and m in keys:
+                        stack.append((m, (*path, b, keys[m]), seen | {m}))
+        return (bits, *self._screen_counts)
+
+    def _screen(self, other) -> bool:
+        """
+        Fast test of possible substructure matching by fingerprints. False if self can't be substructure of other.
+
+        Paths fingerprint of other used only if already calculated, e.g. by `SubstructureIndex`:
+        building it for one-off matching is slower than matching itself.
+        """
+        mask = self._screen_mask
+        if not mask or mask != getattr(other, '_screen_mask', 0) or other._atoms_signatures is None:
+            return True
+        counts, atoms, bonds, rings = self._screen_counts
+        o_counts, o_atoms, o_bonds, o_rings = other._screen_counts
+        if atoms > o_atoms or bonds > o_bonds or rings > o_rings or \
+                any(c > o_counts.get(k, 0) for k, c in counts.items()):
+            return False
+        if '_screen_fingerprint' in other.__dict__:
+            bits = self._screen_fingerprint[0]
+            return bits & other._screen_fingerprint[0] == bits
+        return True
+
+    def __components_mapping(self, other, o_order, automorphism_filter, symmetry, plan, budget, executor):
+        o_atoms = other._atoms_signatures
+        if o_atoms is not None and self._atoms_masks is not None:
+            if plan is None:
+                components, closures = self.__compiled_masks_query
+            else:
+                components, closures = plan.components, plan.closures
+            o_atoms = o_atoms.copy()  # plain dicts are faster
+            o_bonds = other._bonds_signatures.copy()
+            s_bonds = self._bonds_signatures
+            atom_eq = atom_match
+            if matrix_threshold is not None and len(o_atoms) >= matrix_threshold:
+                o_arrays = other._signatures_arrays
+            else:
+                o_arrays = None
+        else:
+            components, closures = self.__compiled_query
+            o_atoms = other._atoms
+            o_bonds = other._bonds
+            s_bonds = self._bonds
+            o_arrays = None
+            atom_eq = eq
+        o_order = o_order.copy()
+        if symmetry:  # query symmetric mappings pruned in search
+            constraints = self._symmetry_constraints
+        else:
+            constraints = ()
+        s_rings = set(self.ring_atoms)
+        o_rings = set(other.skin_atoms) if s_rings else None  # rings atoms superset. cheaper than sssr
 
         seen = set()
+        o_components = [set(x) for x in other.connected_components]
+        mappers = {}  # query and target components pairs mappings. shared by permutations
+        if executor is not None:  # all pairs searched in pool
+            for i, (order, depth) in enumerate(components):
+                for j, component in enumerate(o_components):
+                    mappers[(i, j)] = executor.submit(self._component_mapping, order, depth, closures, s_bonds,
+                                                      s_rings, o_atoms, o_bonds, o_rings, o_arrays, component,
+                                                      o_order, atom_eq, constraints, budget)
         if len(components) == 1:
-            for candidate in other.connected_components:
-                for mapping in self.__get_mapping(components[0], closures, o_atoms, o_bonds, set(candidate), o_order):
+            for j, component in enumerate(o_components):
+                if executor is not None:
+                    mapper = mappers[(0, j)].result()
+                else:
+                    mapper = self.__get_mapping(*components[0], closures, s_bonds, s_rings, o_atoms, o_bonds, o_rings,
+                                                o_arrays, component, o_order, atom_eq, constraints, budget)
+                for mapping in mapper:
                     if automorphism_filter:
                         atoms = frozenset(mapping.values())
                         if atoms in seen:
@@ -118,48 +353,190 @@ class Isomorphism:
                         seen.add(atoms)
                     yield mapping
         else:
-            for candidates in permutations((set(x) for x in other.connected_components), len(components)):
-                mappers = [self.__get_mapping(order, closures, o_atoms, o_bonds, component, o_order)
-                           for order, component in zip(components, candidates)]
-                for match in lazy_product(*mappers):
-                    mapping = match[0]
-                    for m in match[1:]:
-                        mapping.update(m)
-                    if automorphism_filter:
-                        atoms = frozenset(mapping.values())
-                        if atoms in seen:
-                            continue
-                        seen.add(atoms)
-                    yield mapping
+            for candidates in permutations(range(len(o_components)), len(components)):
+                pairs = []
+                for i, j in enumerate(candidates):
+                    try:
+                        mapper = mappers[(i, j)]
+                    except KeyError:
+                        order, depth = components[i]
+                        mapper = mappers[(i, j)] = LazyCache(
+                            self.__get_mapping(order, depth, closures, s_bonds, s_rings, o_atoms, o_bonds, o_rings,
+                                               o_arrays, o_components[j], o_order, atom_eq, constraints, budget))
+                    else:
+                        if isinstance(mapper, Future):
+                            mapper = mappers[(i, j)] = mapper.result()
+                    if not mapper:  # component not matched. skip permutation
+                        break
+                    pairs.append(mapper)
+                else:
+                    for match in lazy_product(*pairs):
+                        mapping = {}
+                        for m in match:
+                            mapping.update(m)
+                        if any(o_order[mapping[n]] > o_order[mapping[m]] for n, m in constraints):
+                            continue  # symmetric components
+                        if automorphism_filter:
+                            atoms = frozenset(mapping.values())
+                            if atoms in seen:
+                                continue
+                            seen.add(atoms)
+                        yield mapping
+
+    @classmethod
+    def _component_mapping(cls, *args) -> List[Dict[int, int]]:
+        """
+        All mappings of query component to target component. Used for pools dispatching.
+        """
+        return list(cls.__get_mapping(*args))
+
+    @classmethod
+    def __domains(cls, linear_query, s_bonds, s_rings, o_atoms, o_bonds, o_rings, o_arrays, scope, atom_eq):
+        """
+        Candidates of query atoms in target. Candidates filtered by atoms equality, bonds multisets
+        and ring membership, then refined: candidate kept if each query neighbor has candidate in its neighbors.
+
+        :return: None if any query atom has no candidates
+        """
+        s_atoms = [linear_query[0]]
+        s_atoms.extend((x[0], x[2]) for x in linear_query[1:])
+        if o_arrays is not None and len(scope) >= matrix_threshold:
+            return cls.__matrix_domains(s_atoms, s_bonds, s_rings, o_arrays, scope)
+
+        o_groups = defaultdict(list)  # same atoms matched once
+        for n in scope:
+            o_groups[o_atoms[n]].append(n)
+
+        o_counts = {}
+        domains = {}
+        for s_n, s_atom in s_atoms:
+            domain = {n for o_atom, ns in o_groups.items() if atom_eq(s_atom, o_atom) for n in ns}
+            if s_n in s_rings:
+                domain &= o_rings
+            s_labels = list(s_bonds[s_n].values())
+            if len(set(s_labels)) < len(s_labels):  # multiple same bonds. check multiset. other cases refined
+                s_counts = Counter(s_labels).items()
+                wrong = []
+                for n in domain:
+                    try:
+                        counts = o_counts[n]
+                    except KeyError:
+                        counts = o_counts[n] = Counter(o_bonds[n].values())
+                    if any(counts[b] < c for b, c in s_counts):
+                        wrong.append(n)
+                domain.difference_update(wrong)
+            if not domain:
+                return
+            domains[s_n] = domain
+
+        changed = True
+        while changed:
+            changed = False
+            for s_n, domain in domains.items():
+                size = len(domain)
+                for m, b in s_bonds[s_n].items():
+                    # target atoms bonded with query neighbor candidates
+                    domain &= {x for y in domains[m] for x, o_b in o_bonds[y].items() if o_b == b}
+                    if not domain:
+                        return
+                if len(domain) != size:
+                    changed = True
+        return domains
 
     @staticmethod
-    def __get_mapping(linear_query, query_closures, o_atoms, o_bonds, scope, groups):
+    def __matrix_domains(s_atoms, s_bonds, s_rings, o_arrays, scope):
+        """
+        Same as `__domains` for signatures matching. Query x target compatibility matrix built in one step
+        and refined by bonds edges arrays.
+        """
+        o_index, o_mapping, signatures, skin, edges = o_arrays
+        rows = {s_n: i for i, (s_n, _) in enumerate(s_atoms)}
+
+        masks = []
+        values = []
+        starts = []
+        for _, s_atom in s_atoms:
+            starts.append(len(masks))
+            for mask, value in s_atom:
+                masks.append(mask)
+                values.append(value)
+        matrix = signatures & array(masks, dtype=int64)[:, None] == array(values, dtype=int64)[:, None]
+        matrix = logical_or.reduceat(matrix, starts)  # any of alternatives
+        if len(scope) != len(o_index):
+            in_scope = zeros(len(o_index), dtype=bool)
+            in_scope[[o_mapping[n] for n in scope]] = True
+            matrix &= in_scope
+        for s_n in s_rings:
+            if s_n in rows:
+                matrix[rows[s_n]] &= skin
+
+        s_edges = []
+        for s_n, r in rows.items():
+            s_labels = list(s_bonds[s_n].values())
+            for m, b in s_bonds[s_n].items():
+                if b not in edges:  # target hasn't required bonds
+                    return
+                s_edges.append((r, rows[m], b))
+            if len(set(s_labels)) < len(s_labels):  # bonds multisets
+                for b, c in Counter(s_labels).items():
+                    if c > 1:
+                        matrix[r] &= bincount(edges[b][0], minlength=len(o_index)) >= c
+
+        if not matrix.any(1).all():
+            return
+        changed = True
+        while changed:
+            changed = False
+            for i, j, b in s_edges:
+                src, dst = edges[b]
+                support = zeros(len(o_index), dtype=bool)  # bonded with neighbor candidates
+                support[src[matrix[j][dst]]] = True
+                row = matrix[i] & support
+                if (row != matrix[i]).any():
+                    if not row.any():
+                        return
+                    matrix[i] = row
+                    changed = True
+        return {s_n: {o_index[x] for x in flatnonzero(matrix[r])} for s_n, r in rows.items()}
+
+    @classmethod
+    def __get_mapping(cls, linear_query, order_depth, query_closures, s_bonds, s_rings, o_atoms, o_bonds, o_rings,
+                      o_arrays, scope, groups, atom_eq, constraints, budget):
+        if budget is not None and not budget.check():
+            return
+        domains = cls.__domains(linear_query, s_bonds, s_rings, o_atoms, o_bonds, o_rings, o_arrays, scope, atom_eq)
+        if domains is None:  # fail fast
+            return
         size = len(linear_query) - 1
-        order_depth = {v[0]: k for k, v in enumerate(linear_query)}
-        equal_cache = defaultdict(dict)
+        ordered = defaultdict(list)  # symmetry constraints of mapped atoms
+        for n, m in constraints:
+            if n in order_depth and m in order_depth:
+                if order_depth[n] < order_depth[m]:
+                    ordered[m].append((n, True))
+                else:
+                    ordered[n].append((m, False))
 
         stack = []
         path = []
         mapping = {}
         reversed_mapping = {}
 
-        s_n, s_atom = linear_query[0]
-        eqs = equal_cache[s_n]
-        for n, o_atom in o_atoms.items():
-            if n in scope:
-                if s_atom == o_atom:
-                    eqs[n] = True
-                    stack.append((n, 0))
-                else:
-                    eqs[n] = False
+        domain = domains[linear_query[0][0]]
+        for n in o_atoms:
+            if n in domain:
+                stack.append((n, 0))
 
         while stack:
+            if budget is not None and not budget.visit():
+                return
             n, depth = stack.pop()
             current = linear_query[depth][0]
             if depth == size:
                 yield {current: n, **mapping}
             else:
                 if len(path) != depth:
+                    if budget is not None:
+                        budget.backtrack()
                     for x in path[depth:]:
                         del mapping[reversed_mapping.pop(x)]
                     path = path[:depth]
@@ -169,30 +546,41 @@ class Isomorphism:
                 reversed_mapping[n] = current
 
                 depth += 1
-                s_n, back, s_atom, s_bond = linear_query[depth]
+                s_n, back, _, s_bond = linear_query[depth]
                 if back != current:
                     n = path[order_depth[back]]
 
-                eqs = equal_cache[s_n]
+                domain = domains[s_n]
                 uniq = set()
                 for o_n, o_bond in o_bonds[n].items():
-                    if o_n in scope and o_n not in reversed_mapping and s_bond == o_bond and groups[o_n] not in uniq:
+                    if o_n in domain and o_n not in reversed_mapping and s_bond == o_bond and groups[o_n] not in uniq:
                         uniq.add(groups[o_n])
-                        if o_n in eqs:
-                            if eqs[o_n]:
-                                if all(bond == o_bonds[mapping[m]].get(o_n) for m, bond in query_closures[s_n]):
-                                    stack.append((o_n, depth))
-                        elif s_atom == o_atoms[o_n]:
-                            eqs[o_n] = True
-                            if all(bond == o_bonds[mapping[m]].get(o_n) for m, bond in query_closures[s_n]):
-                                stack.append((o_n, depth))
-                        else:
-                            eqs[o_n] = False
+                        if all(bond == o_bonds[mapping[m]].get(o_n) for m, bond in query_closures[s_n]) and \
+                                all(groups[mapping[m]] <= groups[o_n] if lt else groups[o_n] <= groups[mapping[m]]
+                                    for m, lt in ordered[s_n]):
+                            stack.append((o_n, depth))
 
     @cached_property
     def __compiled_query(self):
         return self.__compile_query(self._atoms, self._bonds, {n: atom_frequency(a) for n, a in self._atoms.items()})
 
+    @cached_property
+    def __compiled_masks_query(self):
+        return self._compile_masks_query()
+
+    def _compile_masks_query(self, stats: Optional[Dict[int, int]] = None):
+        """
+        DFS order of query atoms. Started from the rarest atoms.
+
+        :param stats: atoms signatures frequencies in targets. By default elements abundance used.
+        """
+        masks = self._atoms_masks.copy()
+        if stats is None:
+            frequencies = {n: atom_frequency(a) for n, a in self._atoms.items()}
+        else:
+            frequencies = {n: sum(c for s, c in stats.items() if atom_match(m, s)) for n, m in masks.items()}
+        return self.__compile_query(masks, self._bonds_signatures.copy(), frequencies)
+
     @staticmethod
     def __compile_query(atoms, bonds, atoms_frequencies):
         closures = defaultdict(list)
@@ -217,7 +605,7 @@ class Isomorphism:
                             else:
                                 closures[front].append((n, bond))
                     seen.add(front)
-        return components, closures
+        return [(order, {v[0]: k for k, v in enumerate(order)}) for order in components], closures
 
     def is_automorphic(self):
         """
@@ -229,23 +617,32 @@ class Isomorphism:
             return False
         return True
 
-    def get_automorphism_mapping(self) -> Iterator[Dict[int, int]]:
+    def get_automorphism_mapping(self, *, timeout: Optional[float] = None, max_nodes: Optional[int] = None,
+                                 cancel=None, budget: Optional[SearchBudget] = None) -> Iterator[Dict[int, int]]:
         """
         Iterator of all possible automorphism mappings.
+
+        :param timeout: search time limit in seconds. `SearchInterrupted` raised on expiry.
+        :param max_nodes: search nodes limit. `SearchInterrupted` raised on expiry.
+        :param cancel: cooperative cancellation token with `is_set()` method, e.g. `threading.Event`.
+        :param budget: search limits and statistics. Overrides timeout, max_nodes and cancel. See `SearchBudget`.
         """
         return self._get_automorphism_mapping(self.atoms_order, self._bonds,
-                                              {n: atom_frequency(a) for n, a in self._atoms.items()})
+                                              {n: atom_frequency(a) for n, a in self._atoms.items()},
+                                              SearchBudget.from_kwargs(budget, timeout, max_nodes, cancel))
 
     @classmethod
     def _get_automorphism_mapping(cls, atoms: Dict[int, int], bonds: Dict[int, Dict[int, Any]],
-                                  atoms_frequencies: Dict[int, int]) -> Iterator[Dict[int, int]]:
+                                  atoms_frequencies: Dict[int, int],
+                                  budget: Optional[SearchBudget] = None) -> Iterator[Dict[int, int]]:
         if len(atoms) == len(set(atoms.values())):
             return  # all atoms unique
 
         components, closures = cls.__compile_query(atoms, bonds, atoms_frequencies)
         groups = {x: n for n, x in enumerate(atoms)}
-        mappers = [cls.__get_mapping(order, closures, atoms, bonds, {x for x, *_ in order}, groups)
-                   for order in components]
+        mappers = [cls.__get_mapping(order, depth, closures, bonds, set(), atoms, bonds, None, None,
+                                     {x for x, *_ in order}, groups, eq, (), budget)
+                   for order, depth in components]
         if len(mappers) == 1:
             for mapping in mappers[0]:
                 if any(k != v for k, v in mapping.items()):
@@ -258,4 +655,176 @@ class Isomorphism:
                 yield mapping
 
 
-__all__ = ['Isomorphism']
+class QueryPlan:
+    """
+    Precompiled substructure search plan of query. Picklable and reusable across targets and processes.
+    Use `compile_query` for creation.
+    """
+    __slots__ = ('query', 'components', 'closures')
+
+    def __init__(self, query: Isomorphism, stats: Optional[Dict[int, int]] = None):
+        """
+        :param query: query structure
+        :param stats: atoms signatures frequencies in targets. See `collect_statistics`.
+        """
+        if query._atoms_masks is None:
+            raise TypeError('query with atoms masks expected')
+        self.query = query
+        self.components, self.closures = query._compile_masks_query(stats)
+
+    def __getstate__(self):
+        return {'query': self.query, 'components': self.components, 'closures': self.closures}
+
+    def __setstate__(self, state):
+        self.query = state['query']
+        self.components = state['components']
+        self.closures = state['closures']
+
+    def get_mapping(self, other, **kwargs) -> Iterator[Dict[int, int]]:
+        """
+        Get query to other substructure mapping generator. Arguments same as for query `get_mapping`.
+        """
+        return self.query.get_mapping(other, plan=self, **kwargs)
+
+    def is_substructure(self, other) -> bool:
+        """
+        Test query is substructure of other
+        """
+        if not self.query._screen(other):
+            return False
+        try:
+            next(self.get_mapping(other, automorphism_filter=False, optimize=False))
+        except StopIteration:
+            return False
+        return True
+
+
+class QuerySet:
+    """
+    Set of queries matched simultaneously. Queries compiled into prefix tree of DFS matching steps:
+    common steps of different queries tested once. Queries also screened by atoms keys counts.
+
+        rules = QuerySet([q1, q2, q3])
+        rules.search(molecule)  # indices of queries found in molecule
+
+    Queries should be the same type with atoms masks support, e.g. QueryContainers or MoleculeContainers.
+    """
+    __slots__ = ('queries', '_tree', '_keys', '_mask', '_fallback', '_verify')
+
+    def __init__(self, queries: Iterable[Isomorphism]):
+        """
+        :param queries: queries structures
+        """
+        self.queries = queries = tuple(queries)
+        if not queries:
+            raise ValueError('empty queries set')
+        self._mask = mask = queries[0]._screen_mask
+        if not mask or any(q._screen_mask != mask or q._atoms_masks is None for q in queries):
+            raise TypeError('queries of same type with atoms masks expected')
+
+        self._tree = tree = ({}, [], set())  # steps children, queries ended on step, queries in subtree
+        self._keys = keys = []
+        self._fallback = fallback = []
+        self._verify = verify = set()
+        for i, q in enumerate(queries):
+            atoms_keys = defaultdict(int)
+            for masks in q._atoms_masks.values():
+                if all(m & mask == mask for m, _ in masks) and len({v & mask for _, v in masks}) == 1:
+                    atoms_keys[masks[0][1] & mask] += 1
+            keys.append(dict(atoms_keys))
+
+            components, closures = q._compile_masks_query()
+            if len(components) > 1:  # multicomponent queries matched separately
+                fallback.append(i)
+                continue
+            if any(getattr(q, x, None) for x in ('_atoms_stereo', '_allenes_stereo', '_cis_trans_stereo')):
+                verify.add(i)  # tree ignores stereo
+
+            order, order_depth = components[0]
+            node = tree
+            node[2].add(i)
+            node = node[0].setdefault((None, order[0][1], None, ()), ({}, [], set()))
+            node[2].add(i)
+            for n, back, masks, bond in order[1:]:
+                step = (order_depth[back], masks, bond,
+                        tuple(sorted((order_depth[m], b) for m, b in closures.get(n, ()))))
+                node = node[0].setdefault(step, ({}, [], set()))
+                node[2].add(i)
+            node[1].append(i)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def search(self, other) -> List[int]:
+        """
+        Indices of queries which are substructures of other.
+        """
+        if getattr(other, '_screen_mask', 0) != self._mask or other._atoms_signatures is None:
+            raise TypeError('structure of queries type expected')
+        signatures = other._atoms_signatures
+        counts = Counter(s & self._mask for s in signatures.values())
+        passed = {i for i, k in enumerate(self._keys) if all(counts[x] >= c for x, c in k.items())}
+        if not passed:
+            return []
+
+        found = set()
+        remaining = passed.difference(self._fallback)
+        if remaining:
+            self.__search(self._tree, [], set(), signatures, other._bonds_signatures, remaining, found)
+
+        queries = self.queries
+        verify = self._verify
+        out = [i for i in found if i not in verify or next(queries[i].get_mapping(other), None) is not None]
+        out.extend(i for i in self._fallback if i in passed and next(queries[i].get_mapping(other), None) is not None)
+        out.sort()
+        return out
+
+    @classmethod
+    def __search(cls, node, path, used, signatures, bonds, remaining, found):
+        for (back, masks, bond, closures), child in node[0].items():
+            if remaining.isdisjoint(child[2]):
+                continue
+            if back is None:
+                candidates = signatures
+            else:
+                candidates = [n for n, b in bonds[path[back]].items() if b == bond]
+            for n in candidates:
+                if n in used or not atom_match(masks, signatures[n]) or \
+                        any(bonds[path[d]].get(n) != b for d, b in closures):
+                    continue
+                ends = remaining.intersection(child[1])
+                if ends:
+                    found.update(ends)
+                    remaining.difference_update(ends)
+                path.append(n)
+                used.add(n)
+                cls.__search(child, path, used, signatures, bonds, remaining, found)
+                path.pop()
+                used.discard(n)
+                if remaining.isdisjoint(child[2]):
+                    break
+
+
+def compile_query(query: Isomorphism, stats: Optional[Dict[int, int]] = None) -> QueryPlan:
+    """
+    Compile query search plan. Atoms matched in order of selectivity.
+
+    :param query: query structure
+    :param stats: atoms signatures frequencies in targets. See `collect_statistics`.
+        By default elements abundance used.
+    """
+    return QueryPlan(query, stats)
+
+
+def collect_statistics(targets: Iterable[Isomorphism]) -> Dict[int, int]:
+    """
+    Atoms signatures frequencies in targets corpus.
+    """
+    stats = defaultdict(int)
+    for t in targets:
+        for s in t._atoms_signatures.values():
+            stats[s] += 1
+    return dict(stats)
+
+
+__all__ = ['Isomorphism', 'QueryPlan', 'QuerySet', 'compile_query', 'collect_statistics']
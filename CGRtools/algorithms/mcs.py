@@ -17,184 +17,218 @@
 #  along with this program; if not, see <https://www.gnu.org/licenses/>.
 #
 from abc import abstractmethod
+from CachedMethods import cached_property
 from collections import defaultdict
-from itertools import product, combinations, islice
-from typing import Dict, Set, Iterator, Tuple
+from typing import Dict, Iterator, List, Optional, Tuple
+from warnings import warn
+from .budget import SearchBudget
+
+
+check_period = 0xf  # McSplit nodes are costly. time checked each 16 nodes
 
 
 class MCS:
     __slots__ = ()
 
     @abstractmethod
-    def get_mcs_mapping(self, other, *, limit=10000) -> Iterator[Dict[int, int]]:
+    def get_mcs_mapping(self, other, *, limit=None, timeout: Optional[float] = None, max_nodes: Optional[int] = None,
+                        cancel=None, budget: Optional[SearchBudget] = None) -> Iterator[Dict[int, int]]:
         """
-        find maximum common substructure. based on clique searching in product graph.
-
-        :param limit: limit tested cliques
+        Find maximum common connected substructure. Branch and bound search of McSplit algorithm:
+        atoms and bonds labels of mapped atoms pairs should be equal, absent bonds should be absent in both.
+
+        McCreesh, C., Prosser, P., & Trimble, J. (2017). A Partitioning Algorithm for Maximum Common Subgraph
+        Problems. Proceedings of IJCAI-17, 712–719. https://doi.org/10.24963/ijcai.2017/99
+
+        :param limit: deprecated. Use max_nodes. Limits search nodes, best mapping found before expiry returned.
+        :param timeout: search time limit in seconds. `SearchInterrupted` raised on expiry.
+        :param max_nodes: search nodes limit. `SearchInterrupted` raised on expiry.
+        :param cancel: cooperative cancellation token with `is_set()` method, e.g. `threading.Event`.
+        :param budget: search limits and statistics. Overrides timeout, max_nodes and cancel. See `SearchBudget`.
+            In partial mode the best of substructures found before expiry returned.
+        :return: generator of one mapping of self atoms to other atoms. Empty if common bonds not found.
         """
-        core_product, full_product = self.__get_product(other)
-        if not core_product:
-            return
-
-        # search maximum bonded substructures
-        hits = []
-        max_atoms = 0
-        max_bonds = 0
-        for mapping in islice(self.__clique(full_product), limit):
-            if len(mapping) < max_atoms:
-                continue
-            # search bonds count
-            bonds = 0
-            seen = set()
-            for n in mapping:
-                seen.add(n)
-                for m in core_product[n]:
-                    if m not in seen and m in mapping:
-                        bonds += 1
-            if bonds > max_bonds:
-                max_bonds = bonds
-                max_atoms = len(mapping) - 1  # -1 is ad-hoc
-                hits = [mapping]
-            elif bonds == max_bonds:
-                hits.append(mapping)
-
-        # search maximal components in substructures
-        hits2 = []
-        max_component = 0
-        for mapping in hits:
-            # search components
-            components = []
-            atoms = mapping.copy()
-            while atoms:
-                n = atoms.pop()
-                seen = {n}
-                queue = [n]
-                component = []
-                while queue:
-                    n = queue.pop(0)
-                    component.append(n)
-                    for m in core_product[n]:
-                        if m not in seen and m in mapping:
-                            queue.append(m)
-                            seen.add(m)
-
-                components.append(component)
-                atoms.difference_update(component)
-
-            # get max component
-            component = max(len(x) for x in components)
-            if component > max_component:
-                max_component = component
-                hits2 = [mapping]
-            elif component == max_component:
-                hits2.append(mapping)
-        yield from (dict(x) for x in hits2)
+        if limit is not None:
+            warn('limit deprecated. Use max_nodes instead', DeprecationWarning)
+            if budget is None:  # old behavior: best of tested substructures without error
+                budget = SearchBudget(timeout, limit if max_nodes is None else max_nodes, cancel, partial=True)
+        budget = SearchBudget.from_kwargs(budget, timeout, max_nodes, cancel)
+        mapping = self._mcs(*self._mcs_graph, *other._mcs_graph, budget)
+        if len(mapping) > 1:
+            yield dict(mapping)
+
+    @cached_property
+    def _mcs_graph(self) -> Tuple[Dict[int, int], Dict[int, Dict[int, int]]]:
+        """
+        Atoms and bonds labels for MCS search. Atoms ordered by decreasing degree.
+        """
+        bonds = self._bonds
+        labels = {n: hash(a) for n, a in sorted(self._atoms.items(), key=lambda x: -len(bonds[x[0]]))}
+        return labels, {n: {m: hash(b) for m, b in ms.items()} for n, ms in bonds.items()}
 
     @staticmethod
-    def __clique(graph) -> Iterator[Set[Tuple[int, int]]]:
+    def _mcs(s_labels: Dict[int, int], s_bonds: Dict[int, Dict[int, int]], o_labels: Dict[int, int],
+             o_bonds: Dict[int, Dict[int, int]], budget: Optional[SearchBudget] = None,
+             best: Optional[List[Tuple[int, int]]] = None) -> List[Tuple[int, int]]:
         """
-        clique search
+        Maximum common connected induced subgraph of labeled graphs.
 
-        adopted from networkx algorithms.clique.find_cliques
+        Atoms pairs partitioned into domains by labels and bonds to mapped atoms. Domains sizes of atoms paired
+        with mapped atoms by equally bonded paths of domains atoms give upper bound of mapping extension.
+        Branches not exceeding the best found mapping pruned. Terminal twins atoms branched once.
+
+        :param best: known common subgraph mapping. Only bigger mappings searched.
+        :return: pairs of mapped atoms
         """
-        subgraph = {x for x, y in graph.items() if y}  # skip isolated nodes
-        if not subgraph:
-            return  # empty or fully disconnected
-        elif len(subgraph) == 2:  # dimer
-            yield set(subgraph)
-            return
-
-        stack = []
-        clique_atoms = [None]
-        candidates = subgraph.copy()
-        roots = candidates - graph[max(subgraph, key=lambda x: len(graph[x]))]
-
-        while True:
-            if roots:
-                root = roots.pop()
-                candidates.remove(root)
-                clique_atoms[-1] = root
-                neighbors = graph[root]
-                neighbors_subgraph = subgraph & neighbors
-                if not neighbors_subgraph:
-                    yield set(clique_atoms)
-                else:
-                    neighbors_candidates = candidates & neighbors
-                    if neighbors_candidates:
-                        stack.append((subgraph, candidates, roots))
-                        clique_atoms.append(None)
-                        subgraph = neighbors_subgraph
-                        candidates = neighbors_candidates
-                        roots = candidates - graph[max(subgraph, key=lambda x: len(candidates & graph[x]))]
-            elif not stack:
+        s_order = {n: i for i, n in enumerate(s_labels)}
+        o_order = {n: i for i, n in enumerate(o_labels)}
+        o_groups = defaultdict(list)
+        for n, a in o_labels.items():
+            o_groups[a].append(n)
+        s_groups = defaultdict(list)
+        for n, a in s_labels.items():
+            if a in o_groups:
+                s_groups[a].append(n)
+        domains = [(ns, o_groups[a], False) for a, ns in s_groups.items()]
+
+        best = best or []
+        mapping = []
+        if not domains or sum(min(len(l), len(r)) for l, r, _ in domains) <= len(best):
+            return best
+
+        def expand(domains):
+            if mapping:  # atoms not pairable through domains with mapped atoms can't extend mapping
+                domains = _connected_domains(domains, s_bonds, o_bonds, mapping)
+                if len(mapping) + sum(min(len(l), len(r)) for l, r, _ in domains) <= len(best):
+                    return
+            # domain with minimal branching. only adjacent to mapped atoms if mapping started
+            index = min((i for i, x in enumerate(domains) if x[2] or not mapping), default=None,
+                        key=lambda i: max(len(domains[i][0]), len(domains[i][1])))
+            if index is None:
                 return
+            left, right, adjacent = domains[index]
+            v = left[0]  # atoms ordered by degree
+            left = left[1:]
+            # domains without v
+            if left:
+                rest = domains.copy()
+                rest[index] = (left, right, adjacent)
             else:
-                clique_atoms.pop()
-                subgraph, candidates, roots = stack.pop()
-
-    def __get_product(self, other):
-        bonds = self._bonds
-        o_bonds = other._bonds
-
-        s_equal = defaultdict(list)  # equal self atoms
-        for n, atom in self._atoms.items():
-            s_equal[atom].append(n)
-        p_equal = defaultdict(list)  # equal other atoms
-        for n, atom in other._atoms.items():
-            p_equal[atom].append(n)
-
-        full_product = {}
-        core_product = {}
-        equal_atoms = {}
-        for atom, ns in s_equal.items():
-            ms = p_equal[atom]
-            if ms:
-                for nm in product(ns, ms):
-                    full_product[nm] = set()
-                    core_product[nm] = set()
-                for n in ns:
-                    equal_atoms[n] = ms  # memory save
-
-        seen = set()
-        for n, o_ns in equal_atoms.items():
-            seen.add(n)
-            for m, b in bonds[n].items():
-                if m in equal_atoms and m not in seen:
-                    o_ms = equal_atoms[m]
-                    for o_n in o_ns:
-                        node1 = (n, o_n)
-                        fms = full_product[node1]
-                        cms = core_product[node1]
-                        for o_m, o_b in o_bonds[o_n].items():
-                            if o_m in o_ms and b == o_b:
-                                node2 = (m, o_m)
-                                full_product[node2].add(node1)
-                                core_product[node2].add(node1)
-                                fms.add(node2)
-                                cms.add(node2)
-
-        atoms = core_product
-        while atoms:
-            new_atoms = set()
-            for n in atoms:
-                core = core_product[n]
-                for nm1, nm2 in combinations(full_product[n], 2):
-                    n1, m1 = nm1
-                    n2, m2 = nm2
-                    if n1 == n2 or m1 == m2:
+                rest = domains[:index] + domains[index + 1:]
+
+            # v neighbors split domains. other atoms keep domains
+            v_bonds = s_bonds[v]
+            l_index = {x: i for i, (ls, _, _) in enumerate(rest) for x in ls}
+            r_index = {x: i for i, (_, rs, _) in enumerate(rest) for x in rs}
+            l_split = defaultdict(lambda: defaultdict(list))
+            for m, b in v_bonds.items():
+                if m in l_index:
+                    l_split[l_index[m]][b].append(m)
+
+            bound = len(mapping) + sum(min(len(l), len(r)) for l, r, _ in domains)
+            terminal = False
+            for w in right:
+                if bound <= len(best):  # best improved in previous branches
+                    return
+                w_bonds = o_bonds[w]
+                if mapping and len(w_bonds) == 1:  # terminal twins give the same subtrees
+                    if terminal:
                         continue
-                    if nm1 in full_product[nm2]:
+                    terminal = True
+                r_split = defaultdict(lambda: defaultdict(list))
+                for m, b in w_bonds.items():
+                    if m in r_index:
+                        r_split[r_index[m]][b].append(m)
+
+                split = []
+                for i, (ls, rs, adj) in enumerate(rest):
+                    if rs is right:
+                        rs = [x for x in rs if x != w]
+                    ls_b = l_split.get(i)
+                    rs_b = r_split.get(i)
+                    if ls_b is None and rs_b is None:
+                        if rs:
+                            split.append((ls, rs, adj))
                         continue
-                    if nm1 not in core and nm2 not in core:
-                        continue
-
-                    full_product[nm1].add(nm2)
-                    full_product[nm2].add(nm1)
-                    new_atoms.add(nm1)
-                    new_atoms.add(nm2)
-            atoms = new_atoms
-
-        return core_product, full_product
+                    if ls_b is not None:
+                        ls = [x for x in ls if x not in v_bonds]
+                    if rs_b is not None:
+                        rs = [x for x in rs if x not in w_bonds]
+                    if ls and rs:
+                        split.append((ls, rs, adj))
+                    if ls_b is not None and rs_b is not None:
+                        for b, ns in ls_b.items():
+                            if b in rs_b:
+                                split.append((sorted(ns, key=s_order.__getitem__),
+                                              sorted(rs_b[b], key=o_order.__getitem__), True))
+                if split and len(mapping) + 1 + sum(min(len(l), len(r)) for l, r, _ in split) > len(best):
+                    yield split, (v, w)
+                elif len(mapping) + 1 > len(best):  # leaf better than best
+                    yield [], (v, w)
+            if mapping and len(s_bonds[v]) == 1:
+                # terminal atoms of adjacent domain bonded to the same mapped atom. unmapped v means unmapped twins
+                left = [x for x in left if len(s_bonds[x]) != 1]
+                if left:
+                    rest[index] = (left, right, adjacent)
+                else:
+                    rest = domains[:index] + domains[index + 1:]
+            if len(mapping) + sum(min(len(l), len(r)) for l, r, _ in rest) > len(best):
+                yield rest, None  # v not mapped
+
+        stack = [(expand(domains), None)]
+        while stack:
+            if budget is not None and not budget.visit(check_period):
+                break
+            try:
+                domains, pair = next(stack[-1][0])
+            except StopIteration:
+                _, pair = stack.pop()
+                if pair is not None:
+                    mapping.pop()
+                if budget is not None:
+                    budget.backtrack()
+                continue
+            if pair is not None:
+                mapping.append(pair)
+                if len(mapping) > len(best):
+                    best = mapping.copy()
+            if domains:
+                stack.append((expand(domains), pair))
+            elif pair is not None:
+                mapping.pop()
+        return best
+
+
+def _connected_domains(domains, s_bonds, o_bonds, mapping):
+    """
+    Domains reduced to atoms pairs connected to mapped pairs by paths of equally bonded domains atoms pairs.
+    """
+    l_index = {x: i for i, (l, _, _) in enumerate(domains) for x in l}
+    r_index = {x: i for i, (_, r, _) in enumerate(domains) for x in r}
+    seen = set()
+    stack = list(mapping)
+    while stack:
+        n, m = stack.pop()
+        o_nbs = o_bonds[m]
+        for x, b in s_bonds[n].items():
+            i = l_index.get(x)
+            if i is None:
+                continue
+            for y, c in o_nbs.items():
+                if c == b and r_index.get(y) == i and (x, y) not in seen:
+                    seen.add((x, y))
+                    stack.append((x, y))
+    s_reach = {x for x, _ in seen}
+    o_reach = {y for _, y in seen}
+    out = []
+    for l, r, adj in domains:
+        if not s_reach.issuperset(l):
+            l = [x for x in l if x in s_reach]
+        if not o_reach.issuperset(r):
+            r = [x for x in r if x in o_reach]
+        if l and r:
+            out.append((l, r, adj))
+    return out
 
 
 __all__ = ['MCS']
@@ -73,6 +73,21 @@ class Morgan:
             return dict.fromkeys(atoms, 1)
         return self._morgan({n: hash(a) for n, a in atoms.items()})
 
+    @cached_property
+    def _canonical_hash(self) -> int:
+        """
+        Isomorphism invariant hash of graph. Atoms labeled by Morgan order and hashed with neighbors labels.
+        Stable between python sessions. Equal graphs have equal hashes, different graphs can collide.
+        """
+        order = self.atoms_order
+        bonds = self._bonds
+        atoms = []
+        for n, a in self._atoms.items():
+            env = sorted((order[m], hash(b)) for m, b in bonds[n].items())
+            atoms.append(tuple_hash((order[n], hash(a), *(x for x in env for x in x))))
+        atoms.sort()
+        return tuple_hash(tuple(atoms))
+
     def _morgan(self, weights: Dict[int, int]) -> Dict[int, int]:
         atoms = self._atoms
         bonds = self._bonds
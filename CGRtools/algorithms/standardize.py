@@ -20,6 +20,7 @@
 from CachedMethods import class_cached_property
 from collections import defaultdict
 from typing import List
+from .isomorphism import QuerySet
 from ..containers import molecule, query  # cyclic imports resolve
 from ..containers.bonds import Bond
 from ..exceptions import ValenceError
@@ -49,7 +50,7 @@ class Standardize:
         hs, log = self.__standardize()
         if hs:
             if not neutralized:
-                self.flush_cache()
+                self.flush_cache(keep_topology=True)
             for n in hs:
                 self._calc_implicit(n)
             # second round. need for intersected groups.
@@ -119,7 +120,7 @@ class Standardize:
                 break  # path from negative atom to positive atom found.
             # path not found. keep negative atom n as is
         if hs:
-            self.flush_cache()
+            self.flush_cache(keep_topology=True)
             for n in hs:
                 self._calc_implicit(n)
                 self._calc_hybridization(n)
@@ -279,7 +280,7 @@ class Standardize:
         if isotopes:
             for i in isotopes:
                 i._Core__isotope = None
-            self.flush_cache()
+            self.flush_cache(keep_topology=True)
             self._fix_stereo()
             return True
         return False
@@ -289,8 +290,13 @@ class Standardize:
         bonds = self._bonds
         hs = set()
         log = []
+        rules = self.__standardize_queries
+        matched = set(rules.search(self))
         for r, (pattern, atom_fix, bonds_fix) in enumerate(self.__standardize_compiled_rules):
+            if r not in matched:
+                continue
             seen = set()
+            new_bonds = False
             for mapping in pattern.get_mapping(self, automorphism_filter=False):
                 match = set(mapping.values())
                 if not match.isdisjoint(seen):  # skip intersected groups
@@ -303,18 +309,23 @@ class Standardize:
                 for n, m, b in bonds_fix:
                     n = mapping[n]
                     m = mapping[m]
-                    if m in bonds[n]:
-                        bonds[n][m]._Bond__order = b
-                    else:
-                        bonds[n][m] = bonds[m][n] = Bond(b)
+                    if m not in bonds[n]:
+                        new_bonds = True
+                    bonds[n][m] = bonds[m][n] = Bond(b)
                 log.append((tuple(match), r, str(pattern)))
-            hs.update(seen)
+            if new_bonds:  # topology changed
+                self.flush_cache()
+            elif seen:  # atoms signatures changed
+                self.flush_cache(keep_topology=True)
+            if seen:
+                hs.update(seen)
+                matched = set(rules.search(self))
         return hs, log
 
     def __patch_path(self, path):
         bonds = self._bonds
         for n, m, b in path:
-            bonds[n][m]._Bond__order = b
+            bonds[n][m] = bonds[m][n] = Bond(b)
 
     def __find_delocalize_path(self, start, finish, constrains):
         bonds = self._bonds
@@ -376,6 +387,10 @@ class Standardize:
             rules.append((q, atom_fix, bonds_fix))
         return rules
 
+    @class_cached_property
+    def __standardize_queries(self):
+        return QuerySet(q for q, *_ in self.__standardize_compiled_rules)
+
     @staticmethod
     def __standardize_rules():
         rules = []
@@ -1291,7 +1306,11 @@ class StandardizeReaction:
         elif not isinstance(self.reactants[0], Standardize):
             raise TypeError('Only Molecules supported')
 
-        for r_pattern, p_pattern, fix in self.__standardize_compiled_rules:
+        rules = self.__standardize_queries
+        matched = {r for m in self.reactants for r in rules.search(m)}
+        for r, (r_pattern, p_pattern, fix) in enumerate(self.__standardize_compiled_rules):
+            if r not in matched:
+                continue
             found = []
             for m in self.reactants:
                 for mapping in r_pattern.get_mapping(m, automorphism_filter=False):
@@ -1591,6 +1610,10 @@ class StandardizeReaction:
             rules.append((r_q, p_q, fix))
         return rules
 
+    @class_cached_property
+    def __standardize_queries(self):
+        return QuerySet(r for r, *_ in self.__standardize_compiled_rules)
+
     @staticmethod
     def __standardize_rules():
         rules = []
@@ -133,7 +133,7 @@ class Stereo:
         self._atoms_stereo.clear()
         self._allenes_stereo.clear()
         self._cis_trans_stereo.clear()
-        self.flush_cache()
+        self.flush_cache(keep_topology=True)
 
     def get_mapping(self, other, **kwargs):
         atoms_stereo = self._atoms_stereo
@@ -151,7 +151,10 @@ class Stereo:
             cis_trans = self._stereo_cis_trans
             allenes = self._stereo_allenes
 
-            for mapping in super().get_mapping(other, **kwargs):
+            # automorphic mappings can differ in stereo. filter them after stereo check.
+            automorphism_filter = kwargs.pop('automorphism_filter', True)
+            seen = set()
+            for mapping in super().get_mapping(other, automorphism_filter=False, **kwargs):
                 for n, s in atoms_stereo.items():
                     m = mapping[n]
                     if m not in other_atoms_stereo:  # self stereo atom not stereo in other
@@ -184,6 +187,11 @@ class Stereo:
                                 if other_translate_cis_trans_sign(on, om, mapping[nn], mapping[nm]) != s:
                                     break
                         else:
+                            if automorphism_filter:
+                                atoms = frozenset(mapping.values())
+                                if atoms in seen:
+                                    continue
+                                seen.add(atoms)
                             yield mapping
         else:
             yield from super().get_mapping(other, **kwargs)
@@ -517,7 +525,7 @@ class MoleculeStereo(Stereo):
             if s:
                 self._atoms_stereo[n] = s > 0
                 if clean_cache:
-                    self.flush_cache()
+                    self.flush_cache(keep_topology=True)
         else:
             c = self._stereo_allenes_centers.get(n)
             if c:
@@ -547,7 +555,7 @@ class MoleculeStereo(Stereo):
                 if s:
                     self._allenes_stereo[c] = s < 0 if r else s > 0
                     if clean_cache:
-                        self.flush_cache()
+                        self.flush_cache(keep_topology=True)
             else:
                 # only tetrahedrons and allenes supported
                 raise NotChiral
@@ -574,7 +582,7 @@ class MoleculeStereo(Stereo):
             else:
                 break
         if flag and clean_cache:
-            self.flush_cache()
+            self.flush_cache(keep_topology=True)
 
     def add_atom_stereo(self, n: int, env: Tuple[int, ...], mark: bool, *, clean_cache=True):
         """
@@ -596,11 +604,11 @@ class MoleculeStereo(Stereo):
         if n in self._chiral_tetrahedrons:
             self._atoms_stereo[n] = self._translate_tetrahedron_sign_reversed(n, env, mark)
             if clean_cache:
-                self.flush_cache()
+                self.flush_cache(keep_topology=True)
         elif n in self._chiral_allenes:
             self._allenes_stereo[n] = self._translate_allene_sign_reversed(n, *env, mark)
             if clean_cache:
-                self.flush_cache()
+                self.flush_cache(keep_topology=True)
         else:  # only tetrahedrons supported
             raise NotChiral
 
@@ -629,11 +637,11 @@ class MoleculeStereo(Stereo):
         if (n, m) in self._chiral_cis_trans:
             self._cis_trans_stereo[(n, m)] = self._translate_cis_trans_sign_reversed(n, m, n1, n2, mark)
             if clean_cache:
-                self.flush_cache()
+                self.flush_cache(keep_topology=True)
         elif (m, n) in self._chiral_cis_trans:
             self._cis_trans_stereo[(m, n)] = self._translate_cis_trans_sign_reversed(m, n, n2, n1, mark)
             if clean_cache:
-                self.flush_cache()
+                self.flush_cache(keep_topology=True)
         else:
             raise NotChiral
 
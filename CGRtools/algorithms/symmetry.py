@@ -0,0 +1,162 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+def automorphism_group(atoms: Dict[int, Any], bonds: Dict[int, Dict[int, Any]]) -> \
+        Tuple[Tuple[int, ...], Tuple[Tuple[int, Dict[int, int]], ...]]:
+    """
+    Automorphism group of colored graph by individualization-refinement search with orbits pruning.
+
+    :param atoms: sortable atoms colors
+    :param bonds: comparable bonds labels
+    :return: base atoms and strong generators of group relative to base. Each generator is pair of level and
+        permutation. Generators of levels >= k fix first k base atoms and generate their stabilizer.
+    """
+    if not atoms:
+        return (), ()
+    keys = {k: i for i, k in enumerate(sorted(set(atoms.values())))}
+    colors, trace = _refine({n: keys[a] for n, a in atoms.items()}, bonds)
+
+    path = []  # first path nodes: colors, target cell color, target cell atoms
+    traces = [trace]
+    while True:
+        cells = defaultdict(list)
+        for n, c in colors.items():
+            cells[c].append(n)
+        target = min((c for c, ns in cells.items() if len(ns) > 1), default=None)
+        if target is None:  # discrete
+            break
+        cell = sorted(cells[target])
+        path.append((colors, target, cell))
+        colors, trace = _refine(_individualize(colors, cell[0]), bonds)
+        traces.append(trace)
+    leaf = {c: n for n, c in colors.items()}
+
+    orbits = {n: n for n in atoms}  # union-find of found generators orbits
+    generators = []
+    for level in reversed(range(len(path))):  # generators of deeper levels fix upper base atoms
+        colors, _, cell = path[level]
+        explored = [cell[0]]
+        for w in cell[1:]:
+            if _find(orbits, w) in {_find(orbits, x) for x in explored}:
+                continue  # equivalent to already explored
+            explored.append(w)
+            g = _search_leaf(*_refine(_individualize(colors, w), bonds), level + 1, path, traces, leaf, bonds)
+            if g is not None:
+                generators.append((level, g))
+                for n, m in g.items():
+                    n = _find(orbits, n)
+                    m = _find(orbits, m)
+                    if n != m:
+                        orbits[max(n, m)] = min(n, m)
+    return tuple(cell[0] for _, _, cell in path), tuple(generators)
+
+
+def automorphism_orbits(atoms: Dict[int, Any], generators) -> Tuple[Tuple[int, ...], ...]:
+    """
+    Orbits of atoms under group generators.
+    """
+    orbits = {n: n for n in atoms}
+    for _, g in generators:
+        for n, m in g.items():
+            n = _find(orbits, n)
+            m = _find(orbits, m)
+            if n != m:
+                orbits[max(n, m)] = min(n, m)
+    out = defaultdict(list)
+    for n in atoms:
+        out[_find(orbits, n)].append(n)
+    return tuple(tuple(x) for x in out.values())
+
+
+def symmetry_constraints(base: Tuple[int, ...], generators) -> List[Tuple[int, int]]:
+    """
+    Symmetry breaking constraints of group. Only one of mappings equivalent by group satisfy all constraints
+    of (n, m) pairs: order of n image < order of m image.
+    """
+    constraints = []
+    for level, n in enumerate(base):
+        gs = [g for l, g in generators if l >= level]  # stabilizer of upper base atoms
+        if not gs:
+            continue
+        orbit = {n}
+        stack = [n]
+        while stack:
+            x = stack.pop()
+            for g in gs:
+                y = g.get(x, x)
+                if y not in orbit:
+                    orbit.add(y)
+                    stack.append(y)
+        constraints.extend((n, m) for m in orbit if m != n)
+    return constraints
+
+
+def _find(orbits, n):
+    while orbits[n] != n:
+        orbits[n] = n = orbits[orbits[n]]
+    return n
+
+
+def _individualize(colors, n):
+    return {m: c * 2 + (m != n) for m, c in colors.items()}
+
+
+def _refine(colors, bonds):
+    """
+    Equitable partition of atoms. Colors ranked by neighbors colors multisets.
+
+    :return: colors and label invariant trace of partition
+    """
+    count = len(set(colors.values()))
+    while True:
+        signatures = {n: (c, tuple(sorted((b, colors[m]) for m, b in bonds[n].items()))) for n, c in colors.items()}
+        ranks = {s: i for i, s in enumerate(sorted(set(signatures.values())))}
+        colors = {n: ranks[s] for n, s in signatures.items()}
+        if len(ranks) == count:
+            return colors, tuple(ranks)
+        count = len(ranks)
+
+
+def _search_leaf(colors, trace, depth, path, traces, leaf, bonds) -> Optional[Dict[int, int]]:
+    """
+    Search leaf equivalent to first leaf in subtree.
+
+    :return: automorphism of first leaf to found leaf
+    """
+    if trace != traces[depth]:
+        return
+    if depth == len(path):
+        g = {leaf[c]: n for n, c in colors.items()}
+        for n, ms in bonds.items():
+            gms = bonds[g[n]]
+            for m, b in ms.items():
+                if gms.get(g[m]) != b:
+                    return
+        return {n: m for n, m in g.items() if n != m}
+    target = path[depth][1]
+    for n in sorted(n for n, c in colors.items() if c == target):
+        g = _search_leaf(*_refine(_individualize(colors, n), bonds), depth + 1, path, traces, leaf, bonds)
+        if g is not None:
+            return g
+
+
+__all__ = ['automorphism_group', 'automorphism_orbits', 'symmetry_constraints']
@@ -16,11 +16,17 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with this program; if not, see <https://www.gnu.org/licenses/>.
 #
+from importlib.util import find_spec
 from .molecule import *
 from .cgr import *
 from .query import *
 from .cgr_query import *
 from .reaction import *
+from .compact import *
 
 
 __all__ = [x for x in locals() if x.endswith('Container')]
+
+if find_spec('numpy'):
+    from .collection import *
+    __all__.append('MoleculeCollection')
@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+"""
+Binary packing primitives. All numbers stored in little-endian byte order.
+
+Record layout: 3 bytes header (format version, record type, flags) followed by type specific data.
+"""
+from array import array
+from json import dumps, loads
+from struct import Struct
+from sys import byteorder
+from typing import Dict, Optional, Tuple, Union
+
+
+VERSION = 3  # 1 stored metadata as plain JSON, 2 pickled
+MOLECULE = 0
+CGR = 1
+REACTION = 2
+
+header = Struct('<BBB')
+uint = Struct('<I')
+scalars = (str, int, float)  # metadata values stored as is. bool is int
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+
+def pack_array(data: array) -> bytes:
+    if byteorder == 'big' and data.itemsize > 1:
+        data = array(data.typecode, data)
+        data.byteswap()
+    return data.tobytes()
+
+
+def unpack_array(typecode: str, buffer: memoryview, offset: int, size: int) -> Tuple[array, int]:
+    """
+    Read array of `size` elements from buffer started from offset.
+
+    :return: array and new offset
+    """
+    data = array(typecode)
+    end = offset + size * data.itemsize
+    data.frombytes(buffer[offset: end])
+    if byteorder == 'big' and data.itemsize > 1:
+        data.byteswap()
+    return data, end
+
+
+def pack_string(data: str) -> bytes:
+    data = data.encode()
+    return uint.pack(len(data)) + data
+
+
+def unpack_string(buffer: memoryview, offset: int) -> Tuple[str, int]:
+    size, = uint.unpack_from(buffer, offset)
+    offset += 4
+    return str(buffer[offset: offset + size], 'utf8'), offset + size
+
+
+def pack_meta(meta: Optional[Dict]) -> bytes:
+    """
+    Metadata stored as JSON. Empty metadata stored as zero length string.
+
+    Metadata of string keys and scalar values stored as JSON object. Otherwise all containers tagged to keep
+    tuples and not string keys: lists stored as ["l", ...], tuples as ["t", ...], dicts as ["d", k1, v1, ...].
+    Only str, int, float, bool, None, list, tuple and dict allowed. Pickle is not used: files can be untrusted.
+    """
+    if not meta:
+        return uint.pack(0)
+    if all(isinstance(k, str) and (v is None or isinstance(v, scalars)) for k, v in meta.items()):
+        return pack_string(dumps(meta))
+    return pack_string(dumps(_encode(meta)))
+
+
+def unpack_meta(buffer: memoryview, offset: int) -> Tuple[Dict, int]:
+    data, offset = unpack_string(buffer, offset)
+    if not data:
+        return {}, offset
+    data = loads(data)
+    if isinstance(data, dict):
+        return data, offset
+    return _decode(data), offset
+
+
+def pack_stereo(atoms_stereo: Dict[int, bool], allenes_stereo: Dict[int, bool],
+                cis_trans_stereo: Dict[Tuple[int, int], bool]) -> bytes:
+    out = [uint.pack(len(atoms_stereo)), uint.pack(len(allenes_stereo)), uint.pack(len(cis_trans_stereo))]
+    for stereo in (atoms_stereo, allenes_stereo):
+        out.append(pack_array(array('I', stereo)))
+        out.append(bytes(stereo.values()))
+    out.append(pack_array(array('I', [x for nm in cis_trans_stereo for x in nm])))
+    out.append(bytes(cis_trans_stereo.values()))
+    return b''.join(out)
+
+
+def unpack_stereo(buffer: memoryview, offset: int) -> Tuple[Dict[int, bool], Dict[int, bool],
+                                                            Dict[Tuple[int, int], bool], int]:
+    atoms_size, allenes_size, cis_trans_size = Struct('<III').unpack_from(buffer, offset)
+    offset += 12
+    out = []
+    for size in (atoms_size, allenes_size):
+        keys, offset = unpack_array('I', buffer, offset, size)
+        out.append({n: bool(s) for n, s in zip(keys, buffer[offset: offset + size])})
+        offset += size
+    keys, offset = unpack_array('I', buffer, offset, 2 * cis_trans_size)
+    out.append({(keys[2 * i], keys[2 * i + 1]): bool(s) for i, s in enumerate(buffer[offset: offset + cis_trans_size])})
+    offset += cis_trans_size
+    return (*out, offset)
+
+
+def _encode(data):
+    if data is None or isinstance(data, scalars):
+        return data
+    elif isinstance(data, list):
+        return ['l', *(_encode(x) for x in data)]
+    elif isinstance(data, tuple):
+        return ['t', *(_encode(x) for x in data)]
+    elif isinstance(data, dict):
+        return ['d', *(_encode(x) for kv in data.items() for x in kv)]
+    raise TypeError('metadata should contain only str, int, float, bool, None, list, tuple and dict')
+
+
+def _decode(data):
+    if not isinstance(data, list):
+        return data
+    tag, *data = data
+    if tag == 'l':
+        return [_decode(x) for x in data]
+    elif tag == 't':
+        return tuple(_decode(x) for x in data)
+    elif tag == 'd':
+        return {_decode(k): _decode(v) for k, v in zip(data[::2], data[1::2])}
+    raise ValueError('invalid metadata')
+
+
+__all__ = ['VERSION', 'MOLECULE', 'CGR', 'REACTION', 'header', 'uint', 'Buffer', 'pack_array', 'unpack_array',
+           'pack_string', 'unpack_string', 'pack_meta', 'unpack_meta', 'pack_stereo', 'unpack_stereo']
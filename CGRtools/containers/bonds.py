@@ -19,15 +19,38 @@
 from typing import Optional
 
 
+_restore = object()  # marker of unpickling
+
+
 class Bond:
+    """
+    Immutable bond. Bonds with same order are interned: `Bond(1) is Bond(1)`.
+    """
     __slots__ = ('__order',)
+    __interned = {}
 
-    def __init__(self, order):
+    def __new__(cls, order=_restore):
+        if order is _restore:  # unpickling of old data. order will be restored from state
+            return object.__new__(cls)
         if not isinstance(order, int):
             raise TypeError('invalid order value')
+        try:
+            return cls.__interned[order]
+        except KeyError:
+            pass
         if order not in (1, 4, 2, 3, 8):
             raise ValueError('order should be from [1, 2, 3, 4, 8]')
-        self.__order = order
+        bond = object.__new__(cls)
+        bond._Bond__order = order
+        cls.__interned[order] = bond
+        return bond
+
+    def __init__(self, order=_restore):
+        if order is _restore:  # __new__ without order allowed only for unpickling which doesn't call __init__
+            raise TypeError('order required')
+
+    def __reduce__(self):
+        return self.__class__, (self.__order,)
 
     def __eq__(self, other):
         if isinstance(other, Bond):
@@ -48,15 +71,30 @@ class Bond:
         return self.__order
 
     def copy(self) -> 'Bond':
-        copy = object.__new__(self.__class__)
-        copy._Bond__order = self.__order
-        return copy
+        """
+        Bonds are immutable. Returns self.
+        """
+        return self
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
 
 
 class DynamicBond:
+    """
+    Immutable dynamic bond. Bonds with same orders are interned.
+    """
     __slots__ = ('__order', '__p_order')
+    __interned = {}
 
-    def __init__(self, order=None, p_order=None):
+    def __new__(cls, order=None, p_order=_restore):
+        if p_order is _restore:
+            if order is None:  # unpickling of old data. orders will be restored from state
+                return object.__new__(cls)
+            p_order = None
         if order is None:
             if not isinstance(p_order, int):
                 raise TypeError('p_order should be int type')
@@ -64,12 +102,26 @@ class DynamicBond:
             raise TypeError('order should be int type or None')
         elif p_order is not None and not isinstance(p_order, int):
             raise TypeError('p_order should be int type or None')
+        try:
+            return cls.__interned[(order, p_order)]
+        except KeyError:
+            pass
 
         if order not in (1, 4, 2, 3, None, 8) or p_order not in (1, 4, 2, 3, None, 8):
             raise ValueError('order or p_order should be from [1, 2, 3, 4, 8]')
 
-        self.__order = order
-        self.__p_order = p_order
+        bond = object.__new__(cls)
+        bond._DynamicBond__order = order
+        bond._DynamicBond__p_order = p_order
+        cls.__interned[(order, p_order)] = bond
+        return bond
+
+    def __init__(self, order=None, p_order=_restore):
+        if order is None and p_order is _restore:  # unpickling only
+            raise TypeError('order or p_order required')
+
+    def __reduce__(self):
+        return self.__class__, (self.__order, self.__p_order)
 
     def __eq__(self, other):
         if isinstance(other, DynamicBond):
@@ -94,7 +146,13 @@ class DynamicBond:
         return self.__p_order
 
     def copy(self) -> 'DynamicBond':
-        copy = object.__new__(self.__class__)
-        copy._DynamicBond__order = self.__order
-        copy._DynamicBond__p_order = self.__p_order
-        return copy
+        """
+        Bonds are immutable. Returns self.
+        """
+        return self
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
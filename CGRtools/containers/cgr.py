@@ -16,22 +16,30 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with this program; if not, see <https://www.gnu.org/licenses/>.
 #
-from CachedMethods import cached_args_method
+from array import array
+from CachedMethods import cached_args_method, cached_property
 from collections import defaultdict
+from struct import Struct
 from typing import List, Union, Tuple, Dict, Optional
 from . import cgr_query as query, molecule  # cyclic imports resolve
+from ._pack import Buffer, CGR, VERSION, header, pack_array, pack_meta, pack_string, unpack_array, unpack_meta, \
+    unpack_string
 from .bonds import Bond, DynamicBond
 from .common import Graph
 from ..algorithms.calculate2d import Calculate2DCGR
 from ..algorithms.components import CGRComponents
 from ..algorithms.depict import DepictCGR
+from ..algorithms.fingerprints import CGRFingerprints
 from ..algorithms.smiles import CGRSmiles
 from ..algorithms.x3dom import X3domCGR
 from ..exceptions import MappingError
 from ..periodictable import DynamicElement, Element, DynamicQueryElement
 
 
-class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X3domCGR):
+counts = Struct('<III')
+
+
+class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X3domCGR, CGRFingerprints):
     __slots__ = ('_conformers', '_p_charges', '_p_radicals', '_hybridizations', '_p_hybridizations')
 
     def __init__(self):
@@ -71,8 +79,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
             p_order = bond.p_order
         elif isinstance(bond, Bond):
             order = p_order = bond.order
-            bond = object.__new__(DynamicBond)
-            bond._DynamicBond__order = bond._DynamicBond__p_order = order
+            bond = DynamicBond(order, order)
         else:
             order = p_order = bond
             bond = DynamicBond(order, order)
@@ -201,9 +208,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
             sub._conformers = [{n: c[n] for n in atoms} for c in self._conformers]
             sub._atoms = ca = {}
             for n in atoms:
-                atom = sa[n].copy()
-                ca[n] = atom
-                atom._attach_to_graph(sub, n)
+                ca[n] = sa[n]._copy_to_graph(sub, n)
 
             # recalculate query marks
                 # recalculate query marks
@@ -224,20 +229,12 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
             u._p_hybridizations.update(other._p_hybridizations)
 
             ub = u._bonds
-            for n in other._bonds:
-                ub[n] = {}
-            seen = set()
             for n, m_bond in other._bonds.items():
-                seen.add(n)
-                for m, bond in m_bond.items():
-                    if m not in seen:
-                        ub[n][m] = ub[m][n] = bond.copy()
+                ub[n] = m_bond.copy()
 
             ua = u._atoms
             for n, atom in other._atoms.items():
-                atom = atom.copy()
-                ua[n] = atom
-                atom._attach_to_graph(u, n)
+                ua[n] = atom._copy_to_graph(u, n)
             return u
         elif isinstance(other, molecule.MoleculeContainer):
             u, other = super().union(other, **kwargs)
@@ -297,8 +294,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
                         if m in common:  # bond to common atoms is broken bond
                             order = bond.order
                             if order:  # skip formed bond. None>X => None>None
-                                bond = object.__new__(DynamicBond)
-                                bond._DynamicBond__order, bond._DynamicBond__p_order = order, None
+                                bond = DynamicBond(order, None)
                                 bonds.append((n, m, bond))
                         else:
                             bonds.append((n, m, bond))
@@ -308,8 +304,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
                     if m not in atoms:
                         if m in common:  # bond to common atoms is formed bond
                             order = bond.order
-                            bond = object.__new__(DynamicBond)
-                            bond._DynamicBond__order, bond._DynamicBond__p_order = None, order
+                            bond = DynamicBond(None, order)
                         bonds.append((n, m, bond))
             for n in common:
                 an = adj[n]
@@ -326,8 +321,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
                 h.add_atom(san.copy(), n, charge=sc[n], is_radical=sr[n], xy=sp[n], p_charge=oc[n], p_is_radical=or_[n])
                 for m, (o1, o2) in adj[n].items():
                     if m not in atoms:
-                        bond = object.__new__(DynamicBond)
-                        bond._DynamicBond__order, bond._DynamicBond__p_order = o1, o2
+                        bond = DynamicBond(o1, o2)
                         bonds.append((n, m, bond))
         elif isinstance(other, CGRContainer):
             oa = other._atoms
@@ -347,8 +341,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
                         if m in common:  # bond to common atoms is broken bond
                             order = bond.order
                             if order:  # skip formed bond. None>X => None>None
-                                bond = object.__new__(DynamicBond)
-                                bond._DynamicBond__order, bond._DynamicBond__p_order = order, None
+                                bond = DynamicBond(order, None)
                                 bonds.append((n, m, bond))
                         else:
                             bonds.append((n, m, bond))
@@ -360,8 +353,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
                         if m in common:  # bond to common atoms is formed bond
                             order = bond.p_order
                             if order:  # skip broken bond. X>None => None>None
-                                bond = object.__new__(DynamicBond)
-                                bond._DynamicBond__order, bond._DynamicBond__p_order = None, order
+                                bond = DynamicBond(None, order)
                                 bonds.append((n, m, bond))
                         else:
                             bonds.append((n, m, bond))
@@ -382,8 +374,7 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
                            p_is_radical=opr[n])
                 for m, (o1, o2) in adj[n].items():
                     if m not in atoms:
-                        bond = object.__new__(DynamicBond)
-                        bond._DynamicBond__order, bond._DynamicBond__p_order = o1, o2
+                        bond = DynamicBond(o1, o2)
                         bonds.append((n, m, bond))
         else:
             raise TypeError('MoleculeContainer or CGRContainer expected')
@@ -408,6 +399,47 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
             return super().get_mcs_mapping(other, **kwargs)
         raise TypeError('CGRContainer expected')
 
+    @cached_property
+    def _atoms_signatures(self) -> Dict[int, int]:
+        """
+        42bit = 9bit isotope | 7bit atomic number | 4bit charge | 4bit p_charge | 1bit radical | 1bit p_radical |
+        4bit p_hybridization | 4bit hybridization | 4bit p_neighbors | 4bit neighbors
+        """
+        charges = self._charges
+        p_charges = self._p_charges
+        radicals = self._radicals
+        p_radicals = self._p_radicals
+        hybridizations = self._hybridizations
+        p_hybridizations = self._p_hybridizations
+        signatures = {}
+        for n, a in self._atoms.items():
+            neighbors, p_neighbors = self.neighbors(n)
+            signatures[n] = (a.isotope or 0) << 33 | a.atomic_number << 26 | charges[n] + 4 << 22 | \
+                p_charges[n] + 4 << 18 | radicals[n] << 17 | p_radicals[n] << 16 | p_hybridizations[n] << 12 | \
+                hybridizations[n] << 8 | min(p_neighbors, 15) << 4 | min(neighbors, 15)
+        return signatures
+
+    @property
+    def _screen_mask(self) -> int:
+        """
+        Atomic number, charges and radical states
+        """
+        return 0x1ffff0000
+
+    @cached_property
+    def _atoms_masks(self) -> Dict[int, Tuple[Tuple[int, int]]]:
+        """
+        Atoms matched by isotope, atomic number, charges and radical states
+        """
+        return {n: ((0x3ffffff0000, s & 0x3ffffff0000),) for n, s in self._atoms_signatures.items()}
+
+    @cached_property
+    def _screen_keys(self) -> Dict[int, int]:
+        """
+        Atoms keys taken from signatures directly. Masks not needed for screening of targets
+        """
+        return {n: s & 0x1ffff0000 for n, s in self._atoms_signatures.items()}
+
     def decompose(self) -> Tuple['molecule.MoleculeContainer', 'molecule.MoleculeContainer']:
         """
         decompose CGR to pair of Molecules, which represents reactants and products state of reaction
@@ -471,6 +503,137 @@ class CGRContainer(Graph, CGRSmiles, CGRComponents, DepictCGR, Calculate2DCGR, X
         self._hybridizations[n] = hybridization
         self._p_hybridizations[n] = p_hybridization
 
+    def pack(self) -> bytes:
+        """
+        Serialize CGR into binary record.
+
+        Atoms stored as 7 bytes (atomic number, charges and radicals in both states, hybridizations in both states),
+        bonds as CSR adjacency of packed neighbor index and both orders.
+        """
+        charges = self._charges
+        p_charges = self._p_charges
+        radicals = self._radicals
+        p_radicals = self._p_radicals
+        hybridizations = self._hybridizations
+        p_hybridizations = self._p_hybridizations
+        plane = self._plane
+        bonds = self._bonds
+        pm = self._parsed_mapping
+
+        numbers = tuple(self._atoms)
+        index = {n: i for i, n in enumerate(numbers)}
+        atoms = []
+        isotopes = []
+        for n, a in self._atoms.items():
+            atoms.extend((a.atomic_number, charges[n] + 4, p_charges[n] + 4, radicals[n], p_radicals[n],
+                          hybridizations[n], p_hybridizations[n]))
+            isotopes.append(a.isotope or 0)
+        indptr = [0]
+        packed = []
+        for n in numbers:
+            for m, bond in bonds[n].items():
+                packed.append(index[m] << 8 | (bond.order or 0) << 4 | (bond.p_order or 0))
+            indptr.append(len(packed))
+
+        flags = 0
+        if any(isotopes):
+            flags |= 1
+        if any(pm.values()):
+            flags |= 2
+        out = [header.pack(VERSION, CGR, flags), counts.pack(len(numbers), len(packed), len(self._conformers)),
+               pack_array(array('I', numbers)), bytes(atoms)]
+        if flags & 1:
+            out.append(pack_array(array('H', isotopes)))
+        out.append(pack_array(array('d', [x for n in numbers for x in plane[n]])))
+        out.append(pack_array(array('I', indptr)))
+        out.append(pack_array(array('I', packed)))
+        if flags & 2:
+            out.append(pack_array(array('I', [pm.get(n, 0) for n in numbers])))
+        for c in self._conformers:
+            out.append(pack_array(array('d', [x for n in numbers for x in c[n]])))
+        out.append(pack_meta(self.meta))
+        out.append(pack_string(self.name))
+        return b''.join(out)
+
+    @classmethod
+    def unpack(cls, buffer: Buffer) -> 'CGRContainer':
+        """
+        Restore CGR from binary record.
+
+        :param buffer: bytes or memoryview
+        """
+        self, offset = cls._unpack(memoryview(buffer), 0)
+        return self
+
+    @classmethod
+    def _unpack(cls, buffer: memoryview, offset: int) -> Tuple['CGRContainer', int]:
+        version, kind, flags = header.unpack_from(buffer, offset)
+        if version != VERSION:
+            raise ValueError(f'unsupported record version: {version}')
+        elif kind != CGR:
+            raise ValueError('CGR record expected')
+        size, adjacency, conformers = counts.unpack_from(buffer, offset + 3)
+        offset += 15
+
+        numbers, offset = unpack_array('I', buffer, offset, size)
+        states, offset = unpack_array('B', buffer, offset, 7 * size)
+        if flags & 1:
+            isotopes, offset = unpack_array('H', buffer, offset, size)
+        else:
+            isotopes = [0] * size
+        plane, offset = unpack_array('d', buffer, offset, 2 * size)
+        indptr, offset = unpack_array('I', buffer, offset, size + 1)
+        packed, offset = unpack_array('I', buffer, offset, adjacency)
+        if flags & 2:
+            pm, offset = unpack_array('I', buffer, offset, size)
+            pm = {n: m for n, m in zip(numbers, pm) if m}
+        else:
+            pm = {}
+        conformers_ = []
+        for _ in range(conformers):
+            c, offset = unpack_array('d', buffer, offset, 3 * size)
+            conformers_.append({n: (c[3 * i], c[3 * i + 1], c[3 * i + 2]) for i, n in enumerate(numbers)})
+        meta, offset = unpack_meta(buffer, offset)
+        name, offset = unpack_string(buffer, offset)
+
+        elements = {e: DynamicElement.from_atomic_number(e) for e in set(states[::7])}
+
+        self = object.__new__(cls)
+        self._atoms = atoms = {}
+        self._bonds = bonds = {}
+        self._charges = charges = {}
+        self._p_charges = p_charges = {}
+        self._radicals = radicals = {}
+        self._p_radicals = p_radicals = {}
+        self._hybridizations = hybridizations = {}
+        self._p_hybridizations = p_hybridizations = {}
+        self._plane = {}
+        for i, n in enumerate(numbers):
+            e, c, pc, r, pr, h, ph = states[7 * i: 7 * i + 7]
+            atom = elements[e](isotopes[i] or None)
+            atoms[n] = atom
+            atom._attach_to_graph(self, n)
+            charges[n] = c - 4
+            p_charges[n] = pc - 4
+            radicals[n] = bool(r)
+            p_radicals[n] = bool(pr)
+            hybridizations[n] = h
+            p_hybridizations[n] = ph
+            self._plane[n] = (plane[2 * i], plane[2 * i + 1])
+
+            bonds[n] = bn = {}
+            for x in packed[indptr[i]: indptr[i + 1]]:
+                m = numbers[x >> 8]
+                if m in bonds:  # bond partially exists. need back-connection.
+                    bn[m] = bonds[m][n]
+                else:
+                    bn[m] = DynamicBond((x >> 4 & 15) or None, (x & 15) or None)
+        self._parsed_mapping = pm
+        self._conformers = conformers_
+        self._Graph__meta = meta
+        self._Graph__name = name
+        return self, offset
+
     def __getstate__(self):
         return {'conformers': self._conformers, 'p_charges': self._p_charges, 'p_radicals': self._p_radicals,
                 **super().__getstate__()}
@@ -16,6 +16,7 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with this program; if not, see <https://www.gnu.org/licenses/>.
 #
+from CachedMethods import cached_property
 from typing import List, Union, Tuple, Dict
 from . import cgr, molecule, query  # cyclic imports resolve
 from .bonds import Bond, DynamicBond
@@ -79,8 +80,7 @@ class QueryCGRContainer(Graph, QueryCGRSmiles, DepictQueryCGR, Calculate2DCGR):
     def add_bond(self, n, m, bond: Union[DynamicBond, Bond, int]):
         if not isinstance(bond, DynamicBond):
             if isinstance(bond, Bond):
-                bond = object.__new__(DynamicBond)
-                bond._DynamicBond__order = bond._DynamicBond__p_order = bond.order
+                bond = DynamicBond(bond.order, bond.order)
             else:
                 bond = DynamicBond(bond, bond)
         super().add_bond(n, m, bond)
@@ -173,9 +173,7 @@ class QueryCGRContainer(Graph, QueryCGRSmiles, DepictQueryCGR, Calculate2DCGR):
 
         sub._atoms = ca = {}
         for n in atoms:
-            atom = sa[n].copy()
-            ca[n] = atom
-            atom._attach_to_graph(sub, n)
+            ca[n] = sa[n]._copy_to_graph(sub, n)
         return sub
 
     def union(self, other, **kwargs) -> 'QueryCGRContainer':
@@ -192,9 +190,7 @@ class QueryCGRContainer(Graph, QueryCGRSmiles, DepictQueryCGR, Calculate2DCGR):
 
                 ua = u._atoms
                 for n, atom in other._atoms.items():
-                    atom = atom.copy()
-                    ua[n] = atom
-                    atom._attach_to_graph(u, n)
+                    ua[n] = atom._copy_to_graph(u, n)
             else:  # CGRContainer
                 un = u._neighbors
                 uh = u._hybridizations
@@ -215,14 +211,8 @@ class QueryCGRContainer(Graph, QueryCGRSmiles, DepictQueryCGR, Calculate2DCGR):
                     atom._attach_to_graph(u, n)
 
             ub = u._bonds
-            for n in other._bonds:
-                ub[n] = {}
-            seen = set()
             for n, m_bond in other._bonds.items():
-                seen.add(n)
-                for m, bond in m_bond.items():
-                    if m not in seen:
-                        ub[n][m] = ub[m][n] = bond.copy()
+                ub[n] = m_bond.copy()
             return u
         elif isinstance(other, (query.QueryContainer, molecule.MoleculeContainer)):
             u, other = super().union(other, **kwargs)
@@ -258,8 +248,7 @@ class QueryCGRContainer(Graph, QueryCGRSmiles, DepictQueryCGR, Calculate2DCGR):
                 seen.add(n)
                 for m, bond in m_bond.items():
                     if m not in seen:
-                        ub[n][m] = ub[m][n] = bc = object.__new__(DynamicBond)
-                        bc._DynamicBond__order = bc._DynamicBond__p_order = bond.order
+                        ub[n][m] = ub[m][n] = DynamicBond(bond.order, bond.order)
             return u
         else:
             raise TypeError('Graph expected')
@@ -274,6 +263,40 @@ class QueryCGRContainer(Graph, QueryCGRSmiles, DepictQueryCGR, Calculate2DCGR):
             return super().get_mcs_mapping(other, **kwargs)
         raise TypeError('CGRContainer or QueryCGRContainer expected')
 
+    @property
+    def _screen_mask(self) -> int:
+        """
+        Atomic number, charges and radical states
+        """
+        return 0x1ffff0000
+
+    @cached_property
+    def _atoms_masks(self) -> Dict[int, Tuple[Tuple[int, int], ...]]:
+        """
+        Query atoms packed same as `CGRContainer._atoms_signatures`.
+        Each combination of allowed neighbors and hybridization pairs is separate alternative.
+        """
+        charges = self._charges
+        p_charges = self._p_charges
+        radicals = self._radicals
+        p_radicals = self._p_radicals
+        masks = {}
+        for n, a in self._atoms.items():
+            value = charges[n] + 4 << 22 | p_charges[n] + 4 << 18 | radicals[n] << 17 | p_radicals[n] << 16
+            if isinstance(a, DynamicAnyElement):
+                mask = 0x3ff0000
+            else:
+                mask = 0x1ffff0000
+                value |= a.atomic_number << 26
+                if a.isotope:
+                    mask |= 0x3fe00000000
+                    value |= a.isotope << 33
+            neighbors = [(0xff, x | y << 4) for x, y in zip(self._neighbors[n], self._p_neighbors[n])] or [(0, 0)]
+            hybridizations = [(0xff00, x << 8 | y << 12)
+                              for x, y in zip(self._hybridizations[n], self._p_hybridizations[n])] or [(0, 0)]
+            masks[n] = tuple((mask | nm | hm, value | nv | hv) for nm, nv in neighbors for hm, hv in hybridizations)
+        return masks
+
     @staticmethod
     def _validate_neighbors(neighbors):
         if neighbors is None:
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+from CachedMethods import cached_property
+from numpy import arange, array, bincount, concatenate, cumsum, diff, float64, int8, int64, minimum, ndarray, \
+    repeat, uint8, uint16, uint32, unique
+from typing import Iterable, Iterator, Union
+from .bonds import Bond
+from .molecule import MoleculeContainer
+from ..periodictable import Element
+
+
+class MoleculeCollection:
+    """
+    Columnar storage of many molecules in shared NumPy arrays.
+
+    Atoms and bonds of all molecules stored in concatenated columns, molecules boundaries stored in offsets arrays.
+    Bonds stored as adjacency lists in atoms order: neighbors counts of atoms, neighbors indices and bonds orders.
+    Basic properties calculated for whole collection by vectorized operations.
+    Indexing returns MoleculeContainer, slicing returns new collection.
+    """
+    __slots__ = ('_atoms_offsets', '_bonds_offsets', '_numbers', '_elements', '_isotopes', '_charges', '_radicals',
+                 '_hydrogens', '_hybridizations', '_plane', '_degrees', '_bonds', '_orders', '_extra', '__dict__')
+
+    def __init__(self, molecules: Iterable[MoleculeContainer] = ()):
+        """
+        :param molecules: iterable of molecules
+        """
+        atoms_counts = []
+        bonds_counts = []
+        numbers = []
+        elements = []
+        isotopes = []
+        charges = []
+        radicals = []
+        hydrogens = []
+        hybridizations = []
+        plane = []
+        degrees = []
+        bonds = []
+        orders = []
+        extra = []
+        for mol in molecules:
+            if not isinstance(mol, MoleculeContainer):
+                raise TypeError('MoleculeContainer expected')
+            mc = mol._charges
+            mr = mol._radicals
+            mh = mol._hydrogens
+            mhb = mol._hybridizations
+            mp = mol._plane
+            mb = mol._bonds
+            index = {n: i for i, n in enumerate(mol._atoms)}
+            for n, a in mol._atoms.items():
+                numbers.append(n)
+                elements.append(a.atomic_number)
+                isotopes.append(a.isotope or 0)
+                charges.append(mc[n])
+                radicals.append(mr[n])
+                h = mh[n]
+                hydrogens.append(-1 if h is None else h)
+                hybridizations.append(mhb[n])
+                plane.append(mp[n])
+                degrees.append(len(mb[n]))
+                for m, b in mb[n].items():
+                    bonds.append(index[m])
+                    orders.append(b.order)
+
+            atoms_counts.append(len(index))
+            bonds_counts.append(sum(len(x) for x in mb.values()))
+            extra.append((mol.meta.copy(), mol.name, mol._parsed_mapping.copy(), mol._atoms_stereo.copy(),
+                          mol._allenes_stereo.copy(), mol._cis_trans_stereo.copy(),
+                          [c.copy() for c in mol._conformers]))
+
+        self._atoms_offsets = concatenate(([0], cumsum(atoms_counts, dtype=int64))).astype(int64)
+        self._bonds_offsets = concatenate(([0], cumsum(bonds_counts, dtype=int64))).astype(int64)
+        self._numbers = array(numbers, dtype=uint32)
+        self._elements = array(elements, dtype=uint8)
+        self._isotopes = array(isotopes, dtype=uint16)
+        self._charges = array(charges, dtype=int8)
+        self._radicals = array(radicals, dtype=bool)
+        self._hydrogens = array(hydrogens, dtype=int8)
+        self._hybridizations = array(hybridizations, dtype=uint8)
+        self._plane = array(plane, dtype=float64).reshape(-1, 2)
+        self._degrees = array(degrees, dtype=uint16)
+        self._bonds = array(bonds, dtype=uint32)
+        self._orders = array(orders, dtype=uint8)
+        self._extra = extra
+
+    def __len__(self):
+        return len(self._extra)
+
+    def __iter__(self) -> Iterator[MoleculeContainer]:
+        return (self.__molecule(i) for i in range(len(self)))
+
+    def __getitem__(self, item: Union[int, slice]) -> Union[MoleculeContainer, 'MoleculeCollection']:
+        if isinstance(item, int):
+            _len = len(self)
+            if item >= _len or item < -_len:
+                raise IndexError('List index out of range')
+            if item < 0:
+                item += _len
+            return self.__molecule(item)
+        elif isinstance(item, slice):
+            start, stop, step = item.indices(len(self))
+            if step != 1:
+                raise ValueError('only continuous slices supported')
+            stop = max(start, stop)
+            return self.__slice(start, stop)
+        raise TypeError('Indices must be integers or slices')
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self)} molecules>'
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__ if k != '__dict__'}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    @cached_property
+    def atoms_count(self) -> ndarray:
+        """
+        Number of atoms in each molecule
+        """
+        return diff(self._atoms_offsets)
+
+    @cached_property
+    def bonds_count(self) -> ndarray:
+        """
+        Number of bonds in each molecule
+        """
+        return diff(self._bonds_offsets) // 2
+
+    @cached_property
+    def molecular_charge(self) -> ndarray:
+        """
+        Total charge of each molecule
+        """
+        return bincount(self._atoms_molecules, weights=self._charges, minlength=len(self)).astype(int64)
+
+    @cached_property
+    def molecular_mass(self) -> ndarray:
+        """
+        Molecular mass of each molecule. Implicit hydrogens not included, same as `MoleculeContainer.molecular_mass`
+        """
+        # unique pairs of atomic number and isotope
+        pairs, inverse = unique(self._elements.astype(uint32) << 16 | self._isotopes, return_inverse=True)
+        masses = array([Element.from_atomic_number(int(x >> 16))(int(x & 0xffff) or None).atomic_mass for x in pairs],
+                       dtype=float64)
+        return bincount(self._atoms_molecules, weights=masses[inverse.ravel()], minlength=len(self))
+
+    @cached_property
+    def connected_components_count(self) -> ndarray:
+        """
+        Number of connected components in each molecule
+        """
+        labels = arange(len(self._elements))
+        if len(self._bonds):
+            n = repeat(labels, self._degrees)
+            m = self._bonds + repeat(self._atoms_offsets[:-1], diff(self._bonds_offsets))
+            while True:  # propagate minimal label along bonds
+                new = labels.copy()
+                minimum.at(new, n, labels[m])
+                minimum.at(new, m, labels[n])
+                new = new[new]
+                if (new == labels).all():
+                    break
+                labels = new
+        roots = labels == arange(len(labels))
+        return bincount(self._atoms_molecules[roots], minlength=len(self))
+
+    @cached_property
+    def rings_count(self) -> ndarray:
+        """
+        SSSR rings count of each molecule
+        """
+        return self.bonds_count - self.atoms_count + self.connected_components_count
+
+    @cached_property
+    def elements_histogram(self) -> ndarray:
+        """
+        Matrix of elements counts. Rows - molecules, columns - atomic numbers from 0 to 118
+        """
+        return bincount(self._atoms_molecules * 119 + self._elements,
+                        minlength=len(self) * 119).astype(uint32).reshape(-1, 119)
+
+    @cached_property
+    def _atoms_molecules(self) -> ndarray:
+        """
+        Index of molecule for each atom
+        """
+        return repeat(arange(len(self)), self.atoms_count)
+
+    def __molecule(self, i: int) -> MoleculeContainer:
+        start, stop = self._atoms_offsets[i: i + 2]
+        b_start, b_stop = self._bonds_offsets[i: i + 2]
+        meta, name, pm, atoms_stereo, allenes_stereo, cis_trans_stereo, conformers = self._extra[i]
+
+        numbers = self._numbers[start: stop].tolist()
+        mol = object.__new__(MoleculeContainer)
+        mol._atoms = atoms = {}
+        mol._bonds = bonds = {}
+        adjacency = zip(self._bonds[b_start: b_stop].tolist(), self._orders[b_start: b_stop].tolist())
+        for n, e, s, d in zip(numbers, self._elements[start: stop].tolist(), self._isotopes[start: stop].tolist(),
+                              self._degrees[start: stop].tolist()):
+            atom = Element.from_atomic_number(e)(s or None)
+            atoms[n] = atom
+            atom._attach_to_graph(mol, n)
+            bonds[n] = bn = {}
+            for _ in range(d):
+                m, b = next(adjacency)
+                m = numbers[m]
+                if m in bonds:  # bond partially exists. need back-connection.
+                    bn[m] = bonds[m][n]
+                else:
+                    bn[m] = Bond(b)
+
+        mol._charges = dict(zip(numbers, self._charges[start: stop].tolist()))
+        mol._radicals = dict(zip(numbers, self._radicals[start: stop].tolist()))
+        mol._hydrogens = {n: None if h == -1 else h for n, h in zip(numbers, self._hydrogens[start: stop].tolist())}
+        mol._hybridizations = dict(zip(numbers, self._hybridizations[start: stop].tolist()))
+        mol._plane = dict(zip(numbers, map(tuple, self._plane[start: stop].tolist())))
+        mol._parsed_mapping = pm.copy()
+        mol._atoms_stereo = atoms_stereo.copy()
+        mol._allenes_stereo = allenes_stereo.copy()
+        mol._cis_trans_stereo = cis_trans_stereo.copy()
+        mol._conformers = [c.copy() for c in conformers]
+        mol._Graph__meta = meta.copy()
+        mol._Graph__name = name
+        return mol
+
+    def __slice(self, start: int, stop: int) -> 'MoleculeCollection':
+        a_start, a_stop = self._atoms_offsets[start], self._atoms_offsets[stop]
+        b_start, b_stop = self._bonds_offsets[start], self._bonds_offsets[stop]
+
+        copy = object.__new__(self.__class__)
+        copy._atoms_offsets = self._atoms_offsets[start: stop + 1] - a_start
+        copy._bonds_offsets = self._bonds_offsets[start: stop + 1] - b_start
+        for k in ('_numbers', '_elements', '_isotopes', '_charges', '_radicals', '_hydrogens', '_hybridizations',
+                  '_plane', '_degrees'):
+            setattr(copy, k, getattr(self, k)[a_start: a_stop])
+        copy._bonds = self._bonds[b_start: b_stop]
+        copy._orders = self._orders[b_start: b_stop]
+        copy._extra = self._extra[start: stop]
+        return copy
+
+
+__all__ = ['MoleculeCollection']
@@ -17,8 +17,8 @@
 #  along with this program; if not, see <https://www.gnu.org/licenses/>.
 #
 from abc import ABC, abstractmethod
-from CachedMethods import cached_property, cached_args_method
-from typing import Dict, Optional, Tuple, Iterable, Iterator, Union, List, Type
+from CachedMethods import cached_property, cached_args_method, FrozenDict
+from typing import Dict, Optional, Tuple, Iterable, Iterator, Union, List, Type, Sequence
 from .bonds import Bond, DynamicBond
 from ..algorithms.components import GraphComponents
 from ..algorithms.isomorphism import Isomorphism
@@ -32,6 +32,10 @@ from ..periodictable import AnyAtom
 class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
     __slots__ = ('_atoms', '_bonds', '_plane', '_charges', '_radicals', '__meta', '__name', '_parsed_mapping',
                  '__dict__', '__weakref__')
+    # caches depended only on atoms connectivity. atoms and bonds labels changes don't affect them.
+    __topology_cache = ('atoms_count', 'atoms_numbers', 'bonds_count', 'connected_components', 'rings_count', 'sssr',
+                        'ring_atoms', 'connected_rings', 'skin_atoms', 'skin_graph')
+    __rings_cache = ('rings_count', 'sssr', 'ring_atoms', 'connected_rings', 'skin_atoms', 'skin_graph')
 
     def __init__(self):
         """
@@ -186,7 +190,17 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
         self._plane[_map] = xy
         self._bonds[_map] = {}
         atom._attach_to_graph(self, _map)
+
+        # isolated atom doesn't change rings
+        topology = self.__topology()
+        if 'atoms_count' in topology:
+            topology['atoms_count'] += 1
+        if 'atoms_numbers' in topology:
+            topology['atoms_numbers'] += (_map,)
+        if 'connected_components' in topology:
+            topology['connected_components'] += ((_map,),)
         self.__dict__.clear()
+        self.__dict__.update(topology)
         return _map
 
     @abstractmethod
@@ -202,7 +216,26 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
             raise ValueError('atoms already bonded')
 
         self._bonds[n][m] = self._bonds[m][n] = bond
+
+        topology = self.__topology()
+        if 'bonds_count' in topology:
+            topology['bonds_count'] += 1
+        components = topology.get('connected_components')
+        if components is not None:
+            cn = next(c for c in components if n in c)
+            if m in cn:  # new ring closed
+                for k in self.__rings_cache:
+                    topology.pop(k, None)
+            else:  # components linked. rings not changed, but skin can be extended by linker.
+                cm = next(c for c in components if m in c)
+                topology['connected_components'] = (*(c for c in components if c is not cn and c is not cm), cn + cm)
+                topology.pop('skin_atoms', None)
+                topology.pop('skin_graph', None)
+        else:
+            for k in self.__rings_cache:
+                topology.pop(k, None)
         self.__dict__.clear()
+        self.__dict__.update(topology)
 
     @abstractmethod
     def delete_atom(self, n: int):
@@ -214,13 +247,27 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
         del self._radicals[n]
         del self._plane[n]
         sb = self._bonds
-        for m in sb.pop(n):
+        neighbors = sb.pop(n)
+        for m in neighbors:
             del sb[m][n]
         try:
             del self._parsed_mapping[n]
         except KeyError:
             pass
+
+        if neighbors:
+            self.__dict__.clear()
+            return
+        # isolated atom doesn't change rings
+        topology = self.__topology()
+        if 'atoms_count' in topology:
+            topology['atoms_count'] -= 1
+        if 'atoms_numbers' in topology:
+            topology['atoms_numbers'] = tuple(x for x in topology['atoms_numbers'] if x != n)
+        if 'connected_components' in topology:
+            topology['connected_components'] = tuple(c for c in topology['connected_components'] if c != (n,))
         self.__dict__.clear()
+        self.__dict__.update(topology)
 
     def delete_bond(self, n: int, m: int):
         """
@@ -228,7 +275,20 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
         """
         del self._bonds[n][m]
         del self._bonds[m][n]
+
+        topology = self.__topology()
+        if 'bonds_count' in topology:
+            topology['bonds_count'] -= 1
+        # component can be split
+        topology.pop('connected_components', None)
+        topology.pop('skin_atoms', None)
+        topology.pop('skin_graph', None)
+        sssr = topology.get('sssr')
+        if sssr is None or any(n in r and m in r for r in sssr):  # ring bond or unknown
+            for k in self.__rings_cache:
+                topology.pop(k, None)
         self.__dict__.clear()
+        self.__dict__.update(topology)
 
     @abstractmethod
     def remap(self, mapping: Dict[int, int], *, copy: bool = False):
@@ -256,9 +316,8 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
                 hc[m] = sc[n]
                 hr[m] = sr[n]
                 hp[m] = sp[n]
-                atom = atom.copy()
-                ha[m] = atom
-                atom._attach_to_graph(h, m)
+                ha[m] = atom._copy_to_graph(h, m)
+            h.__dict__.update(self.__remap_topology(mg))
         else:
             hb = {}
             ha = {}
@@ -289,9 +348,70 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
 
         self._bonds = hb
         self._parsed_mapping = hm
+        topology = self.__remap_topology(mg)
         self.__dict__.clear()
+        self.__dict__.update(topology)
         return self
 
+    @classmethod
+    def _arrays_state(cls, atoms: Sequence[AnyAtom], bonds: Iterable[Tuple[int, int, Union[Bond, DynamicBond]]],
+                      numbers: Optional[Sequence[int]], charges: Optional[Sequence[int]],
+                      radicals: Optional[Sequence[bool]], plane: Optional[Sequence[Tuple[float, float]]]) -> Dict:
+        """
+        Validate atoms and bonds arrays at once and prepare state for __setstate__.
+        """
+        size = len(atoms)
+        if numbers is None:
+            numbers = range(1, size + 1)
+        else:
+            if len(numbers) != size:
+                raise ValueError('atoms and numbers lengths mismatch')
+            if not all(isinstance(n, int) for n in numbers):
+                raise TypeError('mapping should be integer')
+            if len(set(numbers)) != size:
+                raise ValueError('atom with same number exists')
+
+        if charges is None:
+            charges = dict.fromkeys(numbers, 0)
+        elif len(charges) != size:
+            raise ValueError('atoms and charges lengths mismatch')
+        else:
+            charges = {n: cls._validate_charge(c) for n, c in zip(numbers, charges)}
+
+        if radicals is None:
+            radicals = dict.fromkeys(numbers, False)
+        elif len(radicals) != size:
+            raise ValueError('atoms and radicals lengths mismatch')
+        else:
+            radicals = {n: cls._validate_radical(r) for n, r in zip(numbers, radicals)}
+
+        if plane is None:
+            plane = {n: (0., 0.) for n in numbers}
+        elif len(plane) != size:
+            raise ValueError('atoms and plane lengths mismatch')
+        else:
+            for xy in plane:
+                if not isinstance(xy, tuple) or len(xy) != 2 or \
+                        not isinstance(xy[0], float) or not isinstance(xy[1], float):
+                    raise TypeError('XY should be tuple with 2 float')
+            plane = dict(zip(numbers, plane))
+
+        g_bonds = {n: {} for n in numbers}
+        for n, m, bond in bonds:
+            if n == m:
+                raise ValueError('atom loops impossible')
+            try:
+                bn = g_bonds[n]
+                bm = g_bonds[m]
+            except KeyError:
+                raise AtomNotFound('atoms not found')
+            if n in bm:
+                raise ValueError('atoms already bonded')
+            bn[m] = bm[n] = bond
+
+        return {'atoms': dict(zip(numbers, atoms)), 'bonds': g_bonds, 'charges': charges, 'radicals': radicals,
+                'plane': plane, 'parsed_mapping': {}, 'meta': {}, 'name': ''}
+
     @abstractmethod
     def copy(self, *, meta: bool = True):
         """
@@ -312,20 +432,11 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
         copy._plane = self._plane.copy()
         copy._parsed_mapping = self._parsed_mapping.copy()
 
-        copy._bonds = cb = {}
-        for n, m_bond in self._bonds.items():
-            cb[n] = cbn = {}
-            for m, bond in m_bond.items():
-                if m in cb:  # bond partially exists. need back-connection.
-                    cbn[m] = cb[m][n]
-                else:
-                    cbn[m] = bond.copy()
-
-        copy._atoms = ca = {}
-        for n, atom in self._atoms.items():
-            atom = atom.copy()
-            ca[n] = atom
-            atom._attach_to_graph(copy, n)
+        # bonds are immutable and shared between copies
+        copy._bonds = {n: m_bond.copy() for n, m_bond in self._bonds.items()}
+
+        copy._atoms = {n: atom._copy_to_graph(copy, n) for n, atom in self._atoms.items()}
+        copy.__dict__.update(self.__topology())  # cached values are immutable
         return copy
 
     @abstractmethod
@@ -354,14 +465,8 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
         sub._plane = {n: sp[n] for n in atoms}
         sub._parsed_mapping = {n: m for n, m in self._parsed_mapping.items() if n in atoms}
 
-        sub._bonds = cb = {}
-        for n in atoms:
-            cb[n] = cbn = {}
-            for m, bond in sb[n].items():
-                if m in cb:  # bond partially exists. need back-connection.
-                    cbn[m] = cb[m][n]
-                elif m in atoms:
-                    cbn[m] = bond.copy()
+        seen = set(atoms)
+        sub._bonds = {n: {m: bond for m, bond in sb[n].items() if m in seen} for n in atoms}
         return sub, atoms
 
     def __and__(self, other):
@@ -440,8 +545,39 @@ class Graph(GraphComponents, Morgan, SSSR, Isomorphism, MCS, ABC):
         """
         return [self.substructure(c, meta=meta) for c in self.connected_components]
 
-    def flush_cache(self):
-        self.__dict__.clear()
+    def flush_cache(self, *, keep_topology: bool = False):
+        """
+        Clear cached properties.
+
+        :param keep_topology: keep rings and components. Useful then only atoms or bonds labels changed.
+        """
+        if keep_topology:
+            topology = self.__topology()
+            self.__dict__.clear()
+            self.__dict__.update(topology)
+        else:
+            self.__dict__.clear()
+
+    def __topology(self):
+        cache = self.__dict__
+        return {k: cache[k] for k in self.__topology_cache if k in cache}
+
+    def __remap_topology(self, mg):
+        cache = self.__dict__
+        topology = {}
+        for k in ('atoms_count', 'bonds_count', 'rings_count'):
+            if k in cache:
+                topology[k] = cache[k]
+        for k in ('atoms_numbers', 'ring_atoms', 'skin_atoms'):
+            if k in cache:
+                topology[k] = tuple(mg(n, n) for n in cache[k])
+        for k in ('connected_components', 'sssr', 'connected_rings'):
+            if k in cache:
+                topology[k] = tuple(tuple(mg(n, n) for n in x) for x in cache[k])
+        if 'skin_graph' in cache:
+            topology['skin_graph'] = FrozenDict((mg(n, n), frozenset(mg(m, m) for m in ms))
+                                                for n, ms in cache['skin_graph'].items())
+        return topology
 
     @staticmethod
     def _validate_charge(charge):
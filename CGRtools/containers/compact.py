@@ -0,0 +1,463 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+from array import array
+from struct import Struct
+from typing import Dict, Iterator, Optional, Tuple
+from weakref import ref
+from . import molecule as _molecule  # cyclic imports resolve
+from ._pack import Buffer, MOLECULE, VERSION, header, pack_array, pack_meta, pack_stereo, pack_string, \
+    unpack_array, unpack_meta, unpack_stereo, unpack_string
+from .bonds import Bond
+from ..exceptions import AtomNotFound
+from ..periodictable import Element
+
+
+counts = Struct('<III')
+
+
+class CompactAtom:
+    """
+    Read-only view of atom stored in CompactMoleculeContainer. Created on demand.
+    """
+    __slots__ = ('__graph', '__index')
+
+    def __init__(self, graph: 'CompactMoleculeContainer', index: int):
+        self.__graph = graph
+        self.__index = index
+
+    def __repr__(self):
+        isotope = self.isotope
+        if isotope:
+            return f'{self.__class__.__name__}({self.atomic_symbol}, {isotope})'
+        return f'{self.__class__.__name__}({self.atomic_symbol})'
+
+    @property
+    def atomic_number(self) -> int:
+        return self.__graph._atoms[5 * self.__index]
+
+    @property
+    def atomic_symbol(self) -> str:
+        return Element.from_atomic_number(self.atomic_number).__name__
+
+    @property
+    def isotope(self) -> Optional[int]:
+        isotopes = self.__graph._isotopes
+        if isotopes is None:
+            return
+        return isotopes[self.__index] or None
+
+    @property
+    def atomic_mass(self) -> float:
+        return Element.from_atomic_number(self.atomic_number)(self.isotope).atomic_mass
+
+    @property
+    def charge(self) -> int:
+        return self.__graph._atoms[5 * self.__index + 1] - 4
+
+    @property
+    def is_radical(self) -> bool:
+        return bool(self.__graph._atoms[5 * self.__index + 2])
+
+    @property
+    def implicit_hydrogens(self) -> Optional[int]:
+        h = self.__graph._atoms[5 * self.__index + 3]
+        if h:
+            return h - 1
+
+    @property
+    def hybridization(self) -> int:
+        return self.__graph._atoms[5 * self.__index + 4]
+
+    @property
+    def neighbors(self) -> int:
+        """
+        Number of neighbors atoms excluding any-bonded
+        """
+        g = self.__graph
+        bonds = g._bonds
+        indptr = g._indptr
+        return sum(bonds[x] & 15 != 8 for x in range(indptr[self.__index], indptr[self.__index + 1]))
+
+    @property
+    def x(self) -> float:
+        return self.__graph._plane[2 * self.__index]
+
+    @property
+    def y(self) -> float:
+        return self.__graph._plane[2 * self.__index + 1]
+
+    @property
+    def xy(self) -> Tuple[float, float]:
+        plane = self.__graph._plane
+        i = 2 * self.__index
+        return plane[i], plane[i + 1]
+
+
+class CompactMoleculeContainer:
+    """
+    Memory efficient read-only storage of molecule.
+
+    Atoms stored in typed arrays: 5 bytes per atom (atomic number, charge, radical, implicit hydrogens,
+    hybridization), isotopes and XY coordinates. Bonds stored in CSR adjacency: indptr and packed
+    neighbor index + bond order. Atom numbers stored only if differ from 1..N sequence.
+    Atoms and bonds objects are created on demand. For editing and algorithms use `to_molecule` method.
+    """
+    __slots__ = ('_numbers', '_atoms', '_isotopes', '_plane', '_indptr', '_bonds', '_parsed_mapping', '_stereo',
+                 '_conformers', '_meta', '_name')
+
+    def __init__(self):
+        """
+        Empty container. Use `from_molecule` for conversion of MoleculeContainer
+        """
+        self._numbers = None
+        self._atoms = array('B')
+        self._isotopes = None
+        self._plane = array('d')
+        self._indptr = array('I', [0])
+        self._bonds = array('I')
+        self._parsed_mapping = None
+        self._stereo = None
+        self._conformers = ()
+        self._meta = None
+        self._name = ''
+
+    @classmethod
+    def from_molecule(cls, molecule: '_molecule.MoleculeContainer') -> 'CompactMoleculeContainer':
+        """
+        Pack MoleculeContainer into compact form
+        """
+        if not isinstance(molecule, _molecule.MoleculeContainer):
+            raise TypeError('MoleculeContainer expected')
+
+        charges = molecule._charges
+        radicals = molecule._radicals
+        hydrogens = molecule._hydrogens
+        hybridizations = molecule._hybridizations
+        plane = molecule._plane
+        bonds = molecule._bonds
+
+        numbers = tuple(molecule._atoms)
+        index = {n: i for i, n in enumerate(numbers)}
+
+        self = object.__new__(cls)
+        if any(n != i for i, n in enumerate(numbers, start=1)):
+            self._numbers = array('I', numbers)
+        else:
+            self._numbers = None
+
+        atoms = []
+        isotopes = []
+        for n, a in molecule._atoms.items():
+            h = hydrogens[n]
+            atoms.extend((a.atomic_number, charges[n] + 4, radicals[n], 0 if h is None else h + 1,
+                          hybridizations[n]))
+            isotopes.append(a.isotope or 0)
+        self._atoms = array('B', atoms)
+        self._isotopes = array('H', isotopes) if any(isotopes) else None
+        self._plane = array('d', [x for n in numbers for x in plane[n]])
+
+        indptr = [0]
+        packed = []
+        for n in numbers:
+            for m, bond in bonds[n].items():
+                packed.append(index[m] << 4 | bond.order)
+            indptr.append(len(packed))
+        self._indptr = array('I', indptr)
+        self._bonds = array('I', packed)
+
+        pm = molecule._parsed_mapping
+        if any(pm.values()):
+            self._parsed_mapping = array('I', [pm.get(n, 0) for n in numbers])
+        else:
+            self._parsed_mapping = None
+        if molecule._atoms_stereo or molecule._allenes_stereo or molecule._cis_trans_stereo:
+            self._stereo = (molecule._atoms_stereo.copy(), molecule._allenes_stereo.copy(),
+                            molecule._cis_trans_stereo.copy())
+        else:
+            self._stereo = None
+        self._conformers = tuple(array('d', [x for n in numbers for x in c[n]]) for c in molecule._conformers)
+        self._meta = molecule.meta.copy() if molecule.meta else None
+        self._name = molecule.name
+        return self
+
+    def to_molecule(self) -> '_molecule.MoleculeContainer':
+        """
+        Unpack into editable MoleculeContainer
+        """
+        numbers = self.atoms_numbers
+        indptr = self._indptr
+        packed = self._bonds
+        plane = self._plane
+        isotopes = self._isotopes or [0] * len(numbers)
+        states = self._atoms
+        elements = {e: Element.from_atomic_number(e) for e in set(states[::5])}
+        orders = {b: Bond(b) for b in (1, 2, 3, 4, 8)}  # interned. back-connections are the same objects
+
+        mol = object.__new__(_molecule.MoleculeContainer)
+        graph = ref(mol)
+        mol._atoms = atoms = {}
+        for n, e, i in zip(numbers, states[::5], isotopes):
+            # atoms filled directly as in `_copy_to_graph`. isotopes were validated on packing
+            atoms[n] = atom = object.__new__(elements[e])
+            atom._Core__isotope = i or None
+            atom._graph = graph
+            atom._map = n
+        mol._charges = {n: c - 4 for n, c in zip(numbers, states[1::5])}
+        mol._radicals = {n: bool(r) for n, r in zip(numbers, states[2::5])}
+        mol._hydrogens = {n: h - 1 if h else None for n, h in zip(numbers, states[3::5])}
+        mol._hybridizations = dict(zip(numbers, states[4::5]))
+        mol._plane = dict(zip(numbers, zip(plane[::2], plane[1::2])))
+        mol._bonds = {n: {numbers[x >> 4]: orders[x & 15] for x in packed[indptr[i]: indptr[i + 1]]}
+                      for i, n in enumerate(numbers)}
+
+        if self._parsed_mapping is None:
+            mol._parsed_mapping = {}
+        else:
+            mol._parsed_mapping = {n: m for n, m in zip(numbers, self._parsed_mapping) if m}
+        if self._stereo is None:
+            mol._atoms_stereo = {}
+            mol._allenes_stereo = {}
+            mol._cis_trans_stereo = {}
+        else:
+            mol._atoms_stereo, mol._allenes_stereo, mol._cis_trans_stereo = (x.copy() for x in self._stereo)
+        mol._conformers = [{n: (c[3 * i], c[3 * i + 1], c[3 * i + 2]) for i, n in enumerate(numbers)}
+                           for c in self._conformers]
+        mol._Graph__meta = self.meta.copy()
+        mol._Graph__name = self._name
+        return mol
+
+    def pack(self) -> bytes:
+        """
+        Serialize into binary record.
+
+        Record contains header, counts of atoms, adjacency entries and conformers, followed by arrays in the same
+        layout as in container. Optional arrays (atoms numbers, isotopes, parsed mapping, stereo) marked by flags.
+        """
+        flags = 0
+        if self._numbers is not None:
+            flags |= 1
+        if self._isotopes is not None:
+            flags |= 2
+        if self._parsed_mapping is not None:
+            flags |= 4
+        if self._stereo is not None:
+            flags |= 8
+
+        out = [header.pack(VERSION, MOLECULE, flags), counts.pack(len(self), len(self._bonds), len(self._conformers))]
+        if self._numbers is not None:
+            out.append(pack_array(self._numbers))
+        out.append(self._atoms.tobytes())
+        if self._isotopes is not None:
+            out.append(pack_array(self._isotopes))
+        out.append(pack_array(self._plane))
+        out.append(pack_array(self._indptr))
+        out.append(pack_array(self._bonds))
+        if self._parsed_mapping is not None:
+            out.append(pack_array(self._parsed_mapping))
+        for c in self._conformers:
+            out.append(pack_array(c))
+        if self._stereo is not None:
+            out.append(pack_stereo(*self._stereo))
+        out.append(pack_meta(self._meta))
+        out.append(pack_string(self._name))
+        return b''.join(out)
+
+    @classmethod
+    def unpack(cls, buffer: Buffer) -> 'CompactMoleculeContainer':
+        """
+        Deserialize binary record. Arrays filled directly from buffer without intermediate objects.
+
+        :param buffer: bytes or memoryview. memoryview of mmap-ed file also supported.
+        """
+        self, offset = cls._unpack(memoryview(buffer), 0)
+        return self
+
+    @classmethod
+    def _unpack(cls, buffer: memoryview, offset: int) -> Tuple['CompactMoleculeContainer', int]:
+        version, kind, flags = header.unpack_from(buffer, offset)
+        if version != VERSION:
+            raise ValueError(f'unsupported record version: {version}')
+        elif kind != MOLECULE:
+            raise ValueError('molecule record expected')
+        atoms, adjacency, conformers = counts.unpack_from(buffer, offset + 3)
+        offset += 15
+
+        self = object.__new__(cls)
+        if flags & 1:
+            self._numbers, offset = unpack_array('I', buffer, offset, atoms)
+        else:
+            self._numbers = None
+        self._atoms, offset = unpack_array('B', buffer, offset, 5 * atoms)
+        if flags & 2:
+            self._isotopes, offset = unpack_array('H', buffer, offset, atoms)
+        else:
+            self._isotopes = None
+        self._plane, offset = unpack_array('d', buffer, offset, 2 * atoms)
+        self._indptr, offset = unpack_array('I', buffer, offset, atoms + 1)
+        self._bonds, offset = unpack_array('I', buffer, offset, adjacency)
+        if flags & 4:
+            self._parsed_mapping, offset = unpack_array('I', buffer, offset, atoms)
+        else:
+            self._parsed_mapping = None
+        conformers_ = []
+        for _ in range(conformers):
+            c, offset = unpack_array('d', buffer, offset, 3 * atoms)
+            conformers_.append(c)
+        self._conformers = tuple(conformers_)
+        if flags & 8:
+            *stereo, offset = unpack_stereo(buffer, offset)
+            self._stereo = tuple(stereo)
+        else:
+            self._stereo = None
+        meta, offset = unpack_meta(buffer, offset)
+        self._meta = meta or None
+        self._name, offset = unpack_string(buffer, offset)
+        return self, offset
+
+    def __len__(self):
+        return len(self._plane) // 2
+
+    def __iter__(self):
+        return iter(self.atoms_numbers)
+
+    def __contains__(self, n: int):
+        if self._numbers is None:
+            return isinstance(n, int) and 0 < n <= len(self)
+        return n in self._numbers
+
+    def __bool__(self):
+        return bool(self._plane)
+
+    def __str__(self):
+        return str(self.to_molecule())
+
+    def __format__(self, format_spec):
+        return format(self.to_molecule(), format_spec)
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}: {len(self)} atoms>'
+
+    def __getstate__(self):
+        return {k: getattr(self, k) for k in self.__slots__}
+
+    def __setstate__(self, state):
+        for k, v in state.items():
+            setattr(self, k, v)
+
+    def _index(self, n: int) -> int:
+        if n not in self:
+            raise AtomNotFound
+        if self._numbers is None:
+            return n - 1
+        return self._numbers.index(n)
+
+    def atom(self, n: int) -> CompactAtom:
+        return CompactAtom(self, self._index(n))
+
+    def has_atom(self, n: int) -> bool:
+        return n in self
+
+    def atoms(self) -> Iterator[Tuple[int, CompactAtom]]:
+        """
+        iterate over all atoms
+        """
+        return ((n, CompactAtom(self, i)) for i, n in enumerate(self.atoms_numbers))
+
+    def iter_atom_records(self) -> Iterator[Tuple[int, int, Optional[int], int, bool, int, Optional[int]]]:
+        """
+        Iterate over atoms as plain tuples:
+        (number, atomic number, isotope, charge, is radical, hybridization, implicit hydrogens).
+
+        Values read directly from arrays without atom views creation.
+        """
+        atoms = self._atoms
+        isotopes = self._isotopes
+        for i, n in enumerate(self.atoms_numbers):
+            j = 5 * i
+            h = atoms[j + 3]
+            yield (n, atoms[j], isotopes[i] or None if isotopes is not None else None, atoms[j + 1] - 4,
+                   bool(atoms[j + 2]), atoms[j + 4], h - 1 if h else None)
+
+    @property
+    def atoms_count(self) -> int:
+        return len(self)
+
+    @property
+    def atoms_numbers(self) -> Tuple[int, ...]:
+        if self._numbers is None:
+            return tuple(range(1, len(self) + 1))
+        return tuple(self._numbers)
+
+    def bond(self, n: int, m: int) -> Bond:
+        i = self._index(n)
+        j = self._index(m)
+        for x in self._bonds[self._indptr[i]: self._indptr[i + 1]]:
+            if x >> 4 == j:
+                return Bond(x & 15)
+        raise KeyError(m)
+
+    def has_bond(self, n: int, m: int) -> bool:
+        i = self._index(n)
+        j = self._index(m)
+        return any(x >> 4 == j for x in self._bonds[self._indptr[i]: self._indptr[i + 1]])
+
+    def bonds(self) -> Iterator[Tuple[int, int, Bond]]:
+        """
+        iterate other all bonds
+        """
+        numbers = self.atoms_numbers
+        indptr = self._indptr
+        packed = self._bonds
+        for i, n in enumerate(numbers):
+            for x in packed[indptr[i]: indptr[i + 1]]:
+                j = x >> 4
+                if j > i:
+                    yield n, numbers[j], Bond(x & 15)
+
+    @property
+    def bonds_count(self) -> int:
+        return len(self._bonds) // 2
+
+    @property
+    def meta(self) -> Dict:
+        if self._meta is None:
+            self._meta = {}
+        return self._meta
+
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def molecular_charge(self) -> int:
+        return sum(self._atoms[1::5]) - 4 * len(self)
+
+    @property
+    def molecular_mass(self) -> float:
+        isotopes = self._isotopes or [0] * len(self)
+        return sum(Element.from_atomic_number(e)(s or None).atomic_mass for e, s in zip(self._atoms[::5], isotopes))
+
+    def __int__(self):
+        return self.molecular_charge
+
+    def __float__(self):
+        return self.molecular_mass
+
+
+__all__ = ['CompactMoleculeContainer']
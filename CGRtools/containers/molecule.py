@@ -18,14 +18,16 @@
 #
 from CachedMethods import cached_args_method, cached_property
 from collections import defaultdict
-from typing import List, Union, Tuple, Optional, Dict
-from . import cgr, query  # cyclic imports resolve
+from typing import List, Union, Tuple, Optional, Dict, Iterable, Iterator, Sequence
+from . import cgr, compact, query  # cyclic imports resolve
+from ._pack import Buffer
 from .bonds import Bond, DynamicBond
 from .common import Graph
 from ..algorithms.aromatics import Aromatize
 from ..algorithms.calculate2d import Calculate2DMolecule
 from ..algorithms.components import StructureComponents
 from ..algorithms.depict import DepictMolecule
+from ..algorithms.fingerprints import MoleculeFingerprints
 from ..algorithms.smiles import MoleculeSmiles
 from ..algorithms.standardize import Standardize
 from ..algorithms.stereo import MoleculeStereo
@@ -35,7 +37,7 @@ from ..periodictable import Element, QueryElement
 
 
 class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeSmiles, StructureComponents,
-                        DepictMolecule, Calculate2DMolecule, X3domMolecule):
+                        DepictMolecule, Calculate2DMolecule, X3domMolecule, MoleculeFingerprints):
     __slots__ = ('_conformers', '_hybridizations', '_atoms_stereo', '_hydrogens', '_cis_trans_stereo',
                  '_allenes_stereo')
 
@@ -53,14 +55,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
         """
         Add new atom.
         """
-        if not isinstance(atom, Element):
-            if isinstance(atom, str):
-                atom = Element.from_symbol(atom)()
-            elif isinstance(atom, int):
-                atom = Element.from_atomic_number(atom)()
-            else:
-                raise TypeError('Element object expected')
-
+        atom = self.__convert_atom(atom)
         _map = super().add_atom(atom, *args, charge=charge, is_radical=is_radical, **kwargs)
         self._hybridizations[_map] = 1
         self._conformers.clear()  # clean conformers. need full recalculation for new system
@@ -81,6 +76,33 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
             self._hydrogens[_map] = 0
         return _map
 
+    @classmethod
+    def from_arrays(cls, atoms: Sequence[Union[Element, int, str]],
+                    bonds: Iterable[Tuple[int, int, Union[Bond, int]]] = (), *,
+                    numbers: Optional[Sequence[int]] = None, charges: Optional[Sequence[int]] = None,
+                    radicals: Optional[Sequence[bool]] = None,
+                    plane: Optional[Sequence[Tuple[float, float]]] = None) -> 'MoleculeContainer':
+        """
+        Build molecule from atoms and bonds lists.
+
+        Arguments validated once. Implicit hydrogens and hybridizations calculated in one pass for all atoms.
+        Faster than sequential `add_atom` and `add_bond` calls.
+
+        :param atoms: Element objects, symbols or atomic numbers
+        :param bonds: (n, m, bond) triples. n and m are atoms numbers
+        :param numbers: atoms numbers. By default 1, 2, 3...
+        :param charges: formal charges of atoms. By default 0
+        :param radicals: radical states of atoms. By default False
+        :param plane: 2d coordinates of atoms. By default (0., 0.)
+        """
+        state = cls._arrays_state([cls.__convert_atom(a) for a in atoms],
+                                  ((n, m, b if isinstance(b, Bond) else Bond(b)) for n, m, b in bonds),
+                                  numbers, charges, radicals, plane)
+        self = object.__new__(cls)
+        self.__setstate__({'conformers': [], 'atoms_stereo': {}, 'allenes_stereo': {}, 'cis_trans_stereo': {},
+                           **state})
+        return self
+
     def add_bond(self, n, m, bond: Union[Bond, int]):
         """
         Connect atoms with bonds.
@@ -149,6 +171,20 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
         if self._atoms[n].atomic_number != 1 and self._atoms[m].atomic_number != 1:
             self._fix_stereo()
 
+    def iter_atom_records(self) -> Iterator[Tuple[int, int, Optional[int], int, bool, int, Optional[int]]]:
+        """
+        Iterate over atoms as plain tuples:
+        (number, atomic number, isotope, charge, is radical, hybridization, implicit hydrogens).
+
+        Fast path for descriptors and writers. Atom objects properties lookups avoided.
+        """
+        charges = self._charges
+        radicals = self._radicals
+        hybridizations = self._hybridizations
+        hydrogens = self._hydrogens
+        for n, a in self._atoms.items():
+            yield n, a.atomic_number, a.isotope, charges[n], radicals[n], hybridizations[n], hydrogens[n]
+
     @cached_args_method
     def neighbors(self, n: int) -> int:
         """number of neighbors atoms excluding any-bonded"""
@@ -250,9 +286,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
             sub._conformers = [{n: c[n] for n in atoms} for c in self._conformers]
             sub._atoms = ca = {}
             for n in atoms:
-                atom = sa[n].copy()
-                ca[n] = atom
-                atom._attach_to_graph(sub, n)
+                ca[n] = sa[n]._copy_to_graph(sub, n)
 
             # recalculate query marks
             sub._hybridizations = {}
@@ -280,18 +314,11 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
 
             ub = u._bonds
             for n, m_bond in other._bonds.items():
-                ub[n] = ubn = {}
-                for m, bond in m_bond.items():
-                    if m in ub:  # bond partially exists. need back-connection.
-                        ubn[m] = ub[m][n]
-                    else:
-                        ubn[m] = bond.copy()
+                ub[n] = m_bond.copy()
 
             ua = u._atoms
             for n, atom in other._atoms.items():
-                atom = atom.copy()
-                ua[n] = atom
-                atom._attach_to_graph(u, n)
+                ua[n] = atom._copy_to_graph(u, n)
             return u
         elif isinstance(other, Graph):
             return other.union(self, **kwargs)
@@ -327,8 +354,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
                     if m not in atoms:
                         if m in common:  # bond to common atoms is broken bond
                             order = bond.order
-                            bond = object.__new__(DynamicBond)
-                            bond._DynamicBond__order, bond._DynamicBond__p_order = order, None
+                            bond = DynamicBond(order, None)
                         bonds.append((n, m, bond))
             for n in other._atoms.keys() - common:  # coupling atoms
                 h.add_atom(oa[n], n, charge=oc[n], is_radical=or_[n], xy=op[n], p_charge=oc[n], p_is_radical=or_[n])
@@ -336,8 +362,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
                     if m not in atoms:
                         if m in common:  # bond to common atoms is formed bond
                             order = bond.order
-                            bond = object.__new__(DynamicBond)
-                            bond._DynamicBond__order, bond._DynamicBond__p_order = None, order
+                            bond = DynamicBond(None, order)
                         bonds.append((n, m, bond))
             for n in common:
                 an = adj[n]
@@ -354,8 +379,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
                 h.add_atom(san, n, charge=sc[n], is_radical=sr[n], xy=sp[n], p_charge=oc[n], p_is_radical=or_[n])
                 for m, (o1, o2) in adj[n].items():
                     if m not in atoms:
-                        bond = object.__new__(DynamicBond)
-                        bond._DynamicBond__order, bond._DynamicBond__p_order = o1, o2
+                        bond = DynamicBond(o1, o2)
                         bonds.append((n, m, bond))
         elif isinstance(other, cgr.CGRContainer):
             oa = other._atoms
@@ -375,8 +399,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
                     if m not in atoms:
                         if m in common:  # bond to common atoms is broken bond
                             order = bond.order
-                            bond = object.__new__(DynamicBond)
-                            bond._DynamicBond__order, bond._DynamicBond__p_order = order, None
+                            bond = DynamicBond(order, None)
                         bonds.append((n, m, bond))
             for n in other._atoms.keys() - common:  # coupling atoms
                 h.add_atom(oa[n].copy(), n, charge=oc[n], is_radical=or_[n], xy=op[n], p_charge=opc[n],
@@ -386,8 +409,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
                         if m in common:  # bond to common atoms is formed bond
                             order = bond.p_order
                             if order:  # skip broken bond. X>None => None>None
-                                bond = object.__new__(DynamicBond)
-                                bond._DynamicBond__order, bond._DynamicBond__p_order = None, order
+                                bond = DynamicBond(None, order)
                                 bonds.append((n, m, bond))
                         else:
                             bonds.append((n, m, bond))
@@ -407,8 +429,7 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
                 h.add_atom(san, n, charge=sc[n], is_radical=sr[n], xy=sp[n], p_charge=opc[n], p_is_radical=opr[n])
                 for m, (o1, o2) in adj[n].items():
                     if m not in atoms:
-                        bond = object.__new__(DynamicBond)
-                        bond._DynamicBond__order, bond._DynamicBond__p_order = o1, o2
+                        bond = DynamicBond(o1, o2)
                         bonds.append((n, m, bond))
         else:
             raise TypeError('MoleculeContainer or CGRContainer expected')
@@ -454,6 +475,47 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
             return super().get_mcs_mapping(other, **kwargs)
         raise TypeError('MoleculeContainer expected')
 
+    @cached_property
+    def _atoms_signatures(self) -> Dict[int, int]:
+        """
+        29bit = 9bit isotope | 7bit atomic number | 4bit charge | 1bit radical | 4bit neighbors | 4bit hybridization
+        """
+        bonds = self._bonds
+        charges = self._charges
+        radicals = self._radicals
+        hybridizations = self._hybridizations
+        signatures = {}
+        for n, a in self._atoms.items():
+            ms = bonds[n]
+            neighbors = len(ms)
+            for b in ms.values():  # any bonds ignored
+                if b.order == 8:
+                    neighbors -= 1
+            signatures[n] = (a.isotope or 0) << 20 | a.atomic_number << 13 | charges[n] + 4 << 9 | \
+                radicals[n] << 8 | min(neighbors, 15) << 4 | hybridizations[n]
+        return signatures
+
+    @property
+    def _screen_mask(self) -> int:
+        """
+        Atomic number, charge and radical state
+        """
+        return 0xfff00
+
+    @cached_property
+    def _atoms_masks(self) -> Dict[int, Tuple[Tuple[int, int]]]:
+        """
+        Atoms matched by isotope, atomic number, charge and radical state
+        """
+        return {n: ((0x1fffff00, s & 0x1fffff00),) for n, s in self._atoms_signatures.items()}
+
+    @cached_property
+    def _screen_keys(self) -> Dict[int, int]:
+        """
+        Atoms keys taken from signatures directly. Masks not needed for screening of targets
+        """
+        return {n: s & 0xfff00 for n, s in self._atoms_signatures.items()}
+
     @cached_property
     def molecular_charge(self):
         """
@@ -532,6 +594,32 @@ class MoleculeContainer(MoleculeStereo, Graph, Aromatize, Standardize, MoleculeS
                     hybridization = 2
         self._hybridizations[n] = hybridization
 
+    def pack(self) -> bytes:
+        """
+        Serialize molecule into compact binary record. Faster and smaller than pickle.
+        Format is same as `CompactMoleculeContainer.pack`.
+        """
+        return compact.CompactMoleculeContainer.from_molecule(self).pack()
+
+    @classmethod
+    def unpack(cls, buffer: Buffer) -> 'MoleculeContainer':
+        """
+        Restore molecule from binary record.
+
+        :param buffer: bytes or memoryview
+        """
+        return compact.CompactMoleculeContainer.unpack(buffer).to_molecule()
+
+    @staticmethod
+    def __convert_atom(atom):
+        if not isinstance(atom, Element):
+            if isinstance(atom, str):
+                return Element.from_symbol(atom)()
+            elif isinstance(atom, int):
+                return Element.from_atomic_number(atom)()
+            raise TypeError('Element object expected')
+        return atom
+
     def __getstate__(self):
         return {'conformers': self._conformers, 'hydrogens': self._hydrogens, 'atoms_stereo': self._atoms_stereo,
                 'allenes_stereo': self._allenes_stereo, 'cis_trans_stereo': self._cis_trans_stereo,
@@ -16,7 +16,8 @@
 #  You should have received a copy of the GNU Lesser General Public License
 #  along with this program; if not, see <https://www.gnu.org/licenses/>.
 #
-from typing import List, Tuple, Union, Dict
+from CachedMethods import cached_property
+from typing import List, Tuple, Union, Dict, Iterable, Optional, Sequence
 from . import cgr, molecule  # cyclic imports resolve
 from .bonds import Bond
 from .common import Graph
@@ -45,22 +46,58 @@ class QueryContainer(QueryStereo, Graph, QuerySmiles, StructureComponents, Depic
                  hybridization: Union[int, List[int], Tuple[int, ...], None] = None, **kwargs):
         neighbors = self._validate_neighbors(neighbors)
         hybridization = self._validate_hybridization(hybridization)
-
-        if not isinstance(atom, (QueryElement, AnyElement)):
-            if isinstance(atom, Element):
-                atom = QueryElement.from_atomic_number(atom.atomic_number)(atom.isotope)
-            elif isinstance(atom, str):
-                atom = QueryElement.from_symbol(atom)()
-            elif isinstance(atom, int):
-                atom = QueryElement.from_atomic_number(atom)()
-            else:
-                raise TypeError('QueryElement object expected')
+        atom = self.__convert_atom(atom)
 
         _map = super().add_atom(atom, *args, **kwargs)
         self._neighbors[_map] = neighbors
         self._hybridizations[_map] = hybridization
         return _map
 
+    @classmethod
+    def from_arrays(cls, atoms: Sequence[Union[QueryElement, AnyElement, Element, int, str]],
+                    bonds: Iterable[Tuple[int, int, Union[Bond, int]]] = (), *,
+                    numbers: Optional[Sequence[int]] = None, charges: Optional[Sequence[int]] = None,
+                    radicals: Optional[Sequence[bool]] = None,
+                    plane: Optional[Sequence[Tuple[float, float]]] = None,
+                    neighbors: Optional[Sequence[Union[int, List[int], Tuple[int, ...], None]]] = None,
+                    hybridizations: Optional[Sequence[Union[int, List[int], Tuple[int, ...], None]]] = None) -> \
+            'QueryContainer':
+        """
+        Build query from atoms and bonds lists.
+
+        Arguments validated once. Faster than sequential `add_atom` and `add_bond` calls.
+
+        :param atoms: QueryElement or AnyElement objects, Element objects, symbols or atomic numbers
+        :param bonds: (n, m, bond) triples. n and m are atoms numbers
+        :param numbers: atoms numbers. By default 1, 2, 3...
+        :param charges: formal charges of atoms. By default 0
+        :param radicals: radical states of atoms. By default False
+        :param plane: 2d coordinates of atoms. By default (0., 0.)
+        :param neighbors: neighbors marks of atoms. By default any
+        :param hybridizations: hybridization marks of atoms. By default any
+        """
+        state = cls._arrays_state([cls.__convert_atom(a) for a in atoms],
+                                  ((n, m, b if isinstance(b, Bond) else Bond(b)) for n, m, b in bonds),
+                                  numbers, charges, radicals, plane)
+        numbers = state['atoms']
+        if neighbors is None:
+            neighbors = dict.fromkeys(numbers, ())
+        elif len(neighbors) != len(numbers):
+            raise ValueError('atoms and neighbors lengths mismatch')
+        else:
+            neighbors = {n: cls._validate_neighbors(x) for n, x in zip(numbers, neighbors)}
+        if hybridizations is None:
+            hybridizations = dict.fromkeys(numbers, ())
+        elif len(hybridizations) != len(numbers):
+            raise ValueError('atoms and hybridizations lengths mismatch')
+        else:
+            hybridizations = {n: cls._validate_hybridization(x) for n, x in zip(numbers, hybridizations)}
+
+        self = object.__new__(cls)
+        self.__setstate__({'atoms_stereo': {}, 'allenes_stereo': {}, 'cis_trans_stereo': {}, 'neighbors': neighbors,
+                           'hybridizations': hybridizations, **state})
+        return self
+
     def add_bond(self, n, m, bond: Union[Bond, int]):
         if not isinstance(bond, Bond):
             bond = Bond(bond)
@@ -204,9 +241,7 @@ class QueryContainer(QueryStereo, Graph, QuerySmiles, StructureComponents, Depic
 
         sub._atoms = ca = {}
         for n in atoms:
-            atom = sa[n].copy()
-            ca[n] = atom
-            atom._attach_to_graph(sub, n)
+            ca[n] = sa[n]._copy_to_graph(sub, n)
         return sub
 
     def union(self, other, **kwargs) -> 'QueryContainer':
@@ -218,9 +253,7 @@ class QueryContainer(QueryStereo, Graph, QuerySmiles, StructureComponents, Depic
 
                 ua = u._atoms
                 for n, atom in other._atoms.items():
-                    atom = atom.copy()
-                    ua[n] = atom
-                    atom._attach_to_graph(u, n)
+                    ua[n] = atom._copy_to_graph(u, n)
             else:
                 un = u._neighbors
                 uh = u._hybridizations
@@ -237,12 +270,7 @@ class QueryContainer(QueryStereo, Graph, QuerySmiles, StructureComponents, Depic
 
             ub = u._bonds
             for n, m_bond in other._bonds.items():
-                ub[n] = ubn = {}
-                for m, bond in m_bond.items():
-                    if m in ub:  # bond partially exists. need back-connection.
-                        ubn[m] = ub[m][n]
-                    else:
-                        ubn[m] = bond.copy()
+                ub[n] = m_bond.copy()
 
             u._atoms_stereo.update(other._atoms_stereo)
             u._allenes_stereo.update(other._allenes_stereo)
@@ -265,6 +293,37 @@ class QueryContainer(QueryStereo, Graph, QuerySmiles, StructureComponents, Depic
             return super().get_mcs_mapping(other, **kwargs)
         raise TypeError('MoleculeContainer or QueryContainer expected')
 
+    @property
+    def _screen_mask(self) -> int:
+        """
+        Atomic number, charge and radical state
+        """
+        return 0xfff00
+
+    @cached_property
+    def _atoms_masks(self) -> Dict[int, Tuple[Tuple[int, int], ...]]:
+        """
+        Query atoms packed same as `MoleculeContainer._atoms_signatures`.
+        Each combination of allowed neighbors and hybridization is separate alternative.
+        """
+        charges = self._charges
+        radicals = self._radicals
+        masks = {}
+        for n, a in self._atoms.items():
+            value = charges[n] + 4 << 9 | radicals[n] << 8
+            if isinstance(a, AnyElement):
+                mask = 0x1f00
+            else:
+                mask = 0xfff00
+                value |= a.atomic_number << 13
+                if a.isotope:
+                    mask |= 0x1ff00000
+                    value |= a.isotope << 20
+            neighbors = [(0xf0, x << 4) for x in self._neighbors[n]] or [(0, 0)]
+            hybridizations = [(0xf, x) for x in self._hybridizations[n]] or [(0, 0)]
+            masks[n] = tuple((mask | nm | hm, value | nv | hv) for nm, nv in neighbors for hm, hv in hybridizations)
+        return masks
+
     @staticmethod
     def _validate_neighbors(neighbors):
         if neighbors is None:
@@ -305,6 +364,18 @@ class QueryContainer(QueryStereo, Graph, QuerySmiles, StructureComponents, Depic
             raise TypeError('hybridization should be int or list or tuple of ints')
         return hybridization
 
+    @staticmethod
+    def __convert_atom(atom):
+        if not isinstance(atom, (QueryElement, AnyElement)):
+            if isinstance(atom, Element):
+                return QueryElement.from_atomic_number(atom.atomic_number)(atom.isotope)
+            elif isinstance(atom, str):
+                return QueryElement.from_symbol(atom)()
+            elif isinstance(atom, int):
+                return QueryElement.from_atomic_number(atom)()
+            raise TypeError('QueryElement object expected')
+        return atom
+
     def __getstate__(self):
         return {'atoms_stereo': self._atoms_stereo, 'allenes_stereo': self._allenes_stereo,
                 'cis_trans_stereo': self._cis_trans_stereo, 'neighbors': self._neighbors,
@@ -22,20 +22,26 @@ from functools import reduce
 from hashlib import sha512
 from itertools import chain
 from operator import or_
+from struct import Struct
 from typing import Dict, Iterable as TIterable, Iterator, Optional, Tuple, Union
+from ._pack import Buffer, CGR, MOLECULE, REACTION, VERSION, header, pack_meta, pack_string, uint, unpack_meta, \
+    unpack_string
 from .cgr import CGRContainer
+from .compact import CompactMoleculeContainer
 from .cgr_query import QueryCGRContainer
 from .molecule import MoleculeContainer
 from .query import QueryContainer
 from ..algorithms.components import ReactionComponents
 from ..algorithms.depict import DepictReaction
+from ..algorithms.fingerprints import ReactionFingerprints
 from ..algorithms.standardize import StandardizeReaction
 
 
 graphs = Union[MoleculeContainer, QueryContainer, CGRContainer, QueryCGRContainer]
+counts = Struct('<III')
 
 
-class ReactionContainer(StandardizeReaction, ReactionComponents, DepictReaction):
+class ReactionContainer(StandardizeReaction, ReactionComponents, DepictReaction, ReactionFingerprints):
     """
     Reaction storage. Contains reactants, products and reagents lists.
 
@@ -131,6 +137,66 @@ class ReactionContainer(StandardizeReaction, ReactionComponents, DepictReaction)
         self._arrow = None
         self._signs = None
 
+    def pack(self) -> bytes:
+        """
+        Serialize reaction into binary record. Only molecules and CGRs supported.
+
+        Record contains header, counts of reactants, reagents and products, length prefixed molecules records,
+        metadata and name.
+        """
+        out = [header.pack(VERSION, REACTION, 0),
+               counts.pack(len(self.__reactants), len(self.__reagents), len(self.__products))]
+        for m in chain(self.__reactants, self.__reagents, self.__products):
+            if not isinstance(m, (MoleculeContainer, CGRContainer)):
+                raise TypeError('only MoleculeContainer or CGRContainer packing supported')
+            m = m.pack()
+            out.append(uint.pack(len(m)))
+            out.append(m)
+        out.append(pack_meta(self.__meta))
+        out.append(pack_string(self.__name))
+        return b''.join(out)
+
+    @classmethod
+    def unpack(cls, buffer: Buffer) -> 'ReactionContainer':
+        """
+        Restore reaction from binary record.
+
+        :param buffer: bytes or memoryview
+        """
+        buffer = memoryview(buffer)
+        version, kind, _ = header.unpack_from(buffer)
+        if version != VERSION:
+            raise ValueError(f'unsupported record version: {version}')
+        elif kind != REACTION:
+            raise ValueError('reaction record expected')
+        offset = 15
+        groups = []
+        for size in counts.unpack_from(buffer, 3):
+            group = []
+            for _ in range(size):
+                offset += 4
+                kind = buffer[offset + 1]
+                if kind == MOLECULE:
+                    m, offset = CompactMoleculeContainer._unpack(buffer, offset)
+                    group.append(m.to_molecule())
+                elif kind == CGR:
+                    m, offset = CGRContainer._unpack(buffer, offset)
+                    group.append(m)
+                else:
+                    raise ValueError('molecule or CGR record expected')
+            groups.append(tuple(group))
+        meta, offset = unpack_meta(buffer, offset)
+        name, offset = unpack_string(buffer, offset)
+
+        reaction = object.__new__(cls)
+        reaction._ReactionContainer__reactants, reaction._ReactionContainer__reagents, \
+            reaction._ReactionContainer__products = groups
+        reaction._ReactionContainer__meta = meta
+        reaction._ReactionContainer__name = name
+        reaction._arrow = None
+        reaction._signs = None
+        return reaction
+
     @property
     def reactants(self) -> Tuple[graphs, ...]:
         return self.__reactants
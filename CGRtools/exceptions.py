@@ -82,3 +82,9 @@ class ImplementationError(Exception):
     """
     Algorithm has errors. Please send example of structure to author for analyze.
     """
+
+
+class SearchInterrupted(Exception):
+    """
+    graph search stopped by time or nodes limits or cancelled
+    """
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+from array import array
+from mmap import mmap, ACCESS_READ
+from os import SEEK_END
+from pathlib import Path
+from struct import Struct
+from sys import byteorder
+from typing import List, Union
+from ..containers import MoleculeContainer, CGRContainer, ReactionContainer
+from ..containers._pack import CGR, MOLECULE, REACTION, unpack_array
+
+
+magic = b'CGRPACK\x01'
+footer = Struct('<QQ')  # offsets table position, records count
+
+
+class PACKRead:
+    """
+    Reader of binary packed molecules, CGRs and reactions created by PACKWrite.
+    Works similar to opened file object. Support `with` context manager.
+
+    File is memory-mapped. Records decoded only on access, thus huge files can be randomly accessed by index or
+    slice without loading into memory.
+    """
+    def __init__(self, file: Union[str, Path]):
+        """
+        :param file: path to file.
+        """
+        if isinstance(file, str):
+            self._file = open(file, 'rb')
+        elif isinstance(file, Path):
+            self._file = file.open('rb')
+        else:
+            raise TypeError('invalid file. str or pathlib.Path expected')
+        self._file.seek(0, SEEK_END)
+        if self._file.tell() < 24:  # empty file can't be mapped
+            self._file.close()
+            raise ValueError('invalid file. PACKWrite created file expected')
+        self.__mmap = mmap(self._file.fileno(), 0, access=ACCESS_READ)
+        self.__buffer = buffer = memoryview(self.__mmap)
+        table, size = footer.unpack_from(buffer, len(buffer) - 16)
+        if buffer[:8] != magic or table + 8 * size + 8 > len(buffer) - 16:
+            buffer.release()
+            self.__mmap.close()
+            self._file.close()
+            raise ValueError('invalid file. PACKWrite created file expected')
+
+        if byteorder == 'little':  # zero-copy view of offsets
+            self.__shifts = buffer[table: table + 8 * size + 8].cast('Q')
+        else:
+            self.__shifts, _ = unpack_array('Q', buffer, table, size + 1)
+        self.__current = 0
+
+    def close(self):
+        """
+        Close opened file
+        """
+        if self.__mmap.closed:
+            return
+        if isinstance(self.__shifts, memoryview):
+            self.__shifts.release()
+        self.__buffer.release()
+        self.__mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _type, value, traceback):
+        self.close()
+
+    def __reduce__(self):  # reopen file in other processes
+        return self.__class__, (self._file.name,)
+
+    def __len__(self):
+        return len(self.__shifts) - 1
+
+    def read(self) -> List[Union[MoleculeContainer, CGRContainer, ReactionContainer]]:
+        """
+        Read whole file
+
+        :return: list of molecules, CGRs or reactions
+        """
+        return list(iter(self))
+
+    def __iter__(self):
+        return (self.__unpack(x) for x in range(self.__current, len(self)))
+
+    def __next__(self):
+        if self.__current >= len(self):
+            raise StopIteration
+        return self.__unpack(self.__current)
+
+    def seek(self, offset: int):
+        """
+        Shifts on a given number of record
+        """
+        if 0 <= offset < len(self):
+            self.__current = offset
+        else:
+            raise IndexError('invalid offset')
+
+    def tell(self) -> int:
+        """
+        :return: number of records processed
+        """
+        return self.__current
+
+    def __getitem__(self, item):
+        """
+        Getting the item by index or list of items by slice
+        """
+        _len = len(self)
+        if isinstance(item, int):
+            if item >= _len or item < -_len:
+                raise IndexError('List index out of range')
+            if item < 0:
+                item += _len
+            return self.__decode(item)
+        elif isinstance(item, slice):
+            return [self.__decode(x) for x in range(*item.indices(_len))]
+        raise TypeError('Indices must be integers or slices')
+
+    def __unpack(self, n: int):
+        record = self.__decode(n)
+        self.__current = n + 1
+        return record
+
+    def __decode(self, n: int) -> Union[MoleculeContainer, CGRContainer, ReactionContainer]:
+        with self.__buffer[self.__shifts[n]: self.__shifts[n + 1]] as record:
+            kind = record[1]
+            if kind == MOLECULE:
+                return MoleculeContainer.unpack(record)
+            elif kind == CGR:
+                return CGRContainer.unpack(record)
+            elif kind == REACTION:
+                return ReactionContainer.unpack(record)
+            raise ValueError(f'invalid record type: {kind}')
+
+
+class PACKWrite:
+    """
+    Writer of molecules, CGRs and reactions into binary packed file.
+    Offsets table written on file closing. Support `with` context manager.
+
+    Any reader can be converted into packed file::
+
+        with SDFRead('data.sdf') as r, PACKWrite('data.pack') as w:
+            for m in r:
+                w.write(m)
+    """
+    def __init__(self, file: Union[str, Path], *, append: bool = False):
+        """
+        :param file: path to file.
+        :param append: append records to existing file.
+        """
+        if isinstance(file, Path):
+            file = str(file)
+        elif not isinstance(file, str):
+            raise TypeError('invalid file. str or pathlib.Path expected')
+
+        if append and Path(file).exists():
+            self._file = open(file, 'r+b')
+            if self._file.read(8) != magic:
+                self._file.close()
+                raise ValueError('invalid file. PACKWrite created file expected')
+            self._file.seek(-16, SEEK_END)
+            table, size = footer.unpack(self._file.read(16))
+            self._file.seek(table)
+            self.__shifts = array('Q')
+            self.__shifts.frombytes(self._file.read(8 * size + 8))
+            if byteorder == 'big':
+                self.__shifts.byteswap()
+            self._file.seek(self.__shifts[-1])  # drop offsets table and alignment
+            self._file.truncate()
+        else:
+            self._file = open(file, 'wb')
+            self._file.write(magic)
+            self.__shifts = array('Q', [8])
+
+    def write(self, data: Union[MoleculeContainer, CGRContainer, ReactionContainer]):
+        """
+        Pack and write record
+        """
+        if not isinstance(data, (MoleculeContainer, CGRContainer, ReactionContainer)):
+            raise TypeError('MoleculeContainer or CGRContainer or ReactionContainer expected')
+        data = data.pack()
+        self._file.write(data)
+        self.__shifts.append(self.__shifts[-1] + len(data))
+
+    def close(self):
+        """
+        Write offsets table and close file
+        """
+        if self._file.closed:
+            return
+        shifts = self.__shifts
+        table = shifts[-1] + (-shifts[-1] % 8)  # table aligned to 8 bytes
+        self._file.write(bytes(table - shifts[-1]))
+        if byteorder == 'big':
+            shifts = array('Q', shifts)
+            shifts.byteswap()
+        self._file.write(shifts.tobytes())
+        self._file.write(footer.pack(table, len(shifts) - 1))
+        self._file.close()
+        self.write = self.__write_closed
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, _type, value, traceback):
+        self.close()
+
+    @staticmethod
+    def __write_closed(_):
+        raise ValueError('I/O operation on closed writer')
+
+
+__all__ = ['PACKRead', 'PACKWrite']
@@ -18,6 +18,7 @@
 #
 from .INCHIrw import *
 from .MRVrw import *
+from .PACKrw import *
 from .PDBrw import *
 from .RDFrw import *
 from .SDFrw import *
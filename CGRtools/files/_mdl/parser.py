@@ -235,16 +235,15 @@ class CGRRead:
         for n, _type, value in molecule['query']:
             atoms[n][_type] = value
 
-        g = self.QueryContainer()
-        pm = g._parsed_mapping
-        for n, atom in enumerate(atoms):
-            n = g.add_atom(QueryElement.from_symbol(atom['element'])(atom['isotope']), mapping[n],
-                           charge=atom['charge'], is_radical=atom['is_radical'],
-                           neighbors=atom.get('neighbors'), hybridization=atom.get('hybridization'),
-                           xy=(atom['x'], atom['y']))
-            pm[n] = atom['mapping']
-        for n, m, b in molecule['bonds']:
-            g.add_bond(mapping[n], mapping[m], b)
+        numbers = [mapping[n] for n in range(len(atoms))]
+        g = self.QueryContainer.from_arrays([QueryElement.from_symbol(a['element'])(a['isotope']) for a in atoms],
+                                            [(mapping[n], mapping[m], b) for n, m, b in molecule['bonds']],
+                                            numbers=numbers, charges=[a['charge'] for a in atoms],
+                                            radicals=[a['is_radical'] for a in atoms],
+                                            plane=[(a['x'], a['y']) for a in atoms],
+                                            neighbors=[a.get('neighbors') for a in atoms],
+                                            hybridizations=[a.get('hybridization') for a in atoms])
+        g._parsed_mapping.update(zip(numbers, (a['mapping'] for a in atoms)))
         return g
 
     def __prepare_structure(self, molecule, mapping):
@@ -184,6 +184,16 @@ class Core(ABC):
         copy._Core__isotope = self.__isotope
         return copy
 
+    def _copy_to_graph(self, graph, _map) -> 'Core':
+        """
+        Copy of element attached to graph
+        """
+        copy = object.__new__(self.__class__)
+        copy._Core__isotope = self.__isotope
+        copy._graph = ref(graph)
+        copy._map = _map
+        return copy
+
     def _attach_to_graph(self, graph, _map):
         try:
             self._graph
@@ -29,7 +29,7 @@ class Dynamic(Core):
         try:
             g = self._graph()
             g._charges[self._map] = g._validate_charge(charge)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -38,7 +38,7 @@ class Dynamic(Core):
         try:
             g = self._graph()
             g._radicals[self._map] = g._validate_radical(is_radical)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -54,7 +54,7 @@ class Dynamic(Core):
         try:
             g = self._graph()
             g._p_charges[self._map] = g._validate_charge(charge)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -70,7 +70,7 @@ class Dynamic(Core):
         try:
             g = self._graph()
             g._p_radicals[self._map] = g._validate_radical(is_radical)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -97,10 +97,15 @@ class DynamicElement(Dynamic):
         """
         get DynamicElement class by its symbol
         """
+        try:
+            return _symbols[symbol]
+        except KeyError:
+            pass
         try:
             element = next(x for x in DynamicElement.__subclasses__() if x.__name__ == f'Dynamic{symbol}')
         except StopIteration:
             raise ValueError(f'DynamicElement with symbol "{symbol}" not found')
+        _symbols[symbol] = element
         return element
 
     @classmethod
@@ -108,10 +113,15 @@ class DynamicElement(Dynamic):
         """
         get DynamicElement class by its number
         """
+        try:
+            return _numbers[number]
+        except KeyError:
+            pass
         try:
             element = next(x for x in DynamicElement.__subclasses__() if x.atomic_number.fget(None) == number)
         except StopIteration:
             raise ValueError(f'DynamicElement with number "{number}" not found')
+        _numbers[number] = element
         return element
 
     @property
@@ -144,4 +154,8 @@ class DynamicElement(Dynamic):
             self.p_charge + 4 << 2 | self.is_radical << 1 | self.p_is_radical
 
 
+_symbols = {}  # classes lookup caches
+_numbers = {}
+
+
 __all__ = ['DynamicElement', 'Dynamic']
@@ -53,7 +53,7 @@ class DynamicQuery(Dynamic):
             neighbors, p_neighbors = g._validate_neighbors_pairing(neighbors, g._p_neighbors[self._map])
             g._neighbors[self._map] = neighbors
             g._p_neighbors[self._map] = p_neighbors
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -65,7 +65,7 @@ class DynamicQuery(Dynamic):
             neighbors, p_neighbors = g._validate_neighbors_pairing(g._neighbors[self._map], p_neighbors)
             g._neighbors[self._map] = neighbors
             g._p_neighbors[self._map] = p_neighbors
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -78,7 +78,7 @@ class DynamicQuery(Dynamic):
                                                                                g._p_hybridizations[self._map])
             g._hybridizations[self._map] = hybridization
             g._p_hybridizations[self._map] = p_hybridization
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -91,7 +91,7 @@ class DynamicQuery(Dynamic):
                                                                                p_hybridization)
             g._hybridizations[self._map] = hybridization
             g._p_hybridizations[self._map] = p_hybridization
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
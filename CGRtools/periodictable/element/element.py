@@ -38,7 +38,7 @@ class Element(Core):
             g = self._graph()
             g._charges[self._map] = g._validate_charge(charge)
             g._calc_implicit(self._map)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
             g._fix_stereo()
         except AttributeError:
             raise IsNotConnectedAtom
@@ -49,7 +49,7 @@ class Element(Core):
             g = self._graph()
             g._radicals[self._map] = g._validate_radical(is_radical)
             g._calc_implicit(self._map)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
             g._fix_stereo()
         except AttributeError:
             raise IsNotConnectedAtom
@@ -87,10 +87,15 @@ class Element(Core):
         """
         get Element class by its symbol
         """
+        try:
+            return _symbols[symbol]
+        except KeyError:
+            pass
         try:
             element = next(x for x in Element.__subclasses__() if x.__name__ == symbol)
         except StopIteration:
             raise ValueError(f'Element with symbol "{symbol}" not found')
+        _symbols[symbol] = element
         return element
 
     @classmethod
@@ -98,10 +103,15 @@ class Element(Core):
         """
         get Element class by its number
         """
+        try:
+            return _numbers[number]
+        except KeyError:
+            pass
         try:
             element = next(x for x in Element.__subclasses__() if x.atomic_number.fget(None) == number)
         except StopIteration:
             raise ValueError(f'Element with number "{number}" not found')
+        _numbers[number] = element
         return element
 
     def __eq__(self, other):
@@ -230,4 +240,8 @@ isotopes = tuple(map(int, '''  1
                           '''.split()))
 
 
+_symbols = {}  # classes lookup caches
+_numbers = {}
+
+
 __all__ = ['Element']
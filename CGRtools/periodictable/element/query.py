@@ -37,7 +37,7 @@ class Query(Core):
         try:
             g = self._graph()
             g._neighbors[self._map] = g._validate_neighbors(neighbors)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -46,7 +46,7 @@ class Query(Core):
         try:
             g = self._graph()
             g._hybridizations[self._map] = g._validate_hybridization(hybridization)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -72,10 +72,15 @@ class QueryElement(Query):
         """
         if symbol == 'A':
             return AnyElement
+        try:
+            return _symbols[symbol]
+        except KeyError:
+            pass
         try:
             element = next(x for x in QueryElement.__subclasses__() if x.__name__ == f'Query{symbol}')
         except StopIteration:
             raise ValueError(f'QueryElement with symbol "{symbol}" not found')
+        _symbols[symbol] = element
         return element
 
     @classmethod
@@ -85,10 +90,15 @@ class QueryElement(Query):
         """
         if number == 0:
             return AnyElement
+        try:
+            return _numbers[number]
+        except KeyError:
+            pass
         try:
             element = next(x for x in QueryElement.__subclasses__() if x.atomic_number.fget(None) == number)
         except StopIteration:
             raise ValueError(f'QueryElement with number "{number}" not found')
+        _numbers[number] = element
         return element
 
     @Core.charge.setter
@@ -107,7 +117,7 @@ class QueryElement(Query):
                     if self._map in path and c in g._allenes_stereo:
                         del g._allenes_stereo[c]
             g._charges[self._map] = g._validate_charge(charge)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -127,7 +137,7 @@ class QueryElement(Query):
                     if self._map in path and c in g._allenes_stereo:
                         del g._allenes_stereo[c]
             g._radicals[self._map] = g._validate_radical(is_radical)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -191,7 +201,7 @@ class AnyElement(Query):  # except Hydrogen!
         try:
             g = self._graph()
             g._charges[self._map] = g._validate_charge(charge)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -200,7 +210,7 @@ class AnyElement(Query):  # except Hydrogen!
         try:
             g = self._graph()
             g._radicals[self._map] = g._validate_radical(is_radical)
-            g.flush_cache()
+            g.flush_cache(keep_topology=True)
         except AttributeError:
             raise IsNotConnectedAtom
 
@@ -228,4 +238,8 @@ class AnyElement(Query):  # except Hydrogen!
             self._neighbors_bitmap.get(self.neighbors, 15) << 4 | self._hybridization_bitmap[self.hybridization]
 
 
+_symbols = {}  # classes lookup caches
+_numbers = {}
+
+
 __all__ = ['QueryElement', 'AnyElement']
@@ -115,7 +115,7 @@ class BaseReactor:
         for n, m, bond in self.__bond_attrs:  # add patch bonds
             n = mapping[n]
             m = mapping[m]
-            new.add_bond(n, m, bond.copy())
+            new.add_bond(n, m, bond)
 
         for n, m_bond in bonds.items():
             if n in to_delete:  # atoms for removing
@@ -124,7 +124,7 @@ class BaseReactor:
             for m, bond in m_bond.items():
                 if m in to_delete or n in old_atoms and m in old_atoms:
                     continue
-                new.add_bond(n, m, bond.copy())
+                new.add_bond(n, m, bond)
 
         # todo: calculate stereo mark based on new atom order
         return new
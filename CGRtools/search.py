@@ -0,0 +1,709 @@
+# -*- coding: utf-8 -*-
+#
+#  Copyright 2020 Ramil Nugmanov <nougmanoff@protonmail.com>
+#  This file is part of CGRtools.
+#
+#  CGRtools is free software; you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as published by
+#  the Free Software Foundation; either version 3 of the License, or
+#  (at your option) any later version.
+#
+#  This program is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public License
+#  along with this program; if not, see <https://www.gnu.org/licenses/>.
+#
+from array import array
+from collections import defaultdict
+from collections.abc import Sequence
+from importlib.util import find_spec
+from math import ceil
+from multiprocessing import Pool
+from pathlib import Path
+from pickle import dump, load
+from time import monotonic
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from .algorithms.budget import SearchBudget
+from .algorithms.fingerprints import fingerprints_matrix
+from .algorithms.isomorphism import QueryPlan, QuerySet, collect_statistics, compile_query, screen_size
+from .algorithms.mcs import MCS
+from .algorithms.morgan import tuple_hash
+from .containers import CGRContainer, MoleculeContainer, QueryContainer, ReactionContainer
+from .files import PACKRead
+
+
+if find_spec('numpy'):
+    from numpy import append, arange, argpartition, argsort, concatenate, lexsort, maximum, minimum, uint8, uint32, \
+        unique, unpackbits, zeros
+    try:
+        from numpy import bitwise_count
+    except ImportError:  # numpy < 2.0
+        bitwise_count = None
+        popcount_table = unpackbits(arange(256, dtype=uint8)[:, None], axis=1).sum(axis=1, dtype=uint8)
+
+screen_counts = 8  # atoms keys counts thresholds stored in index. higher counts screened as this limit
+chunk_size = 1000  # candidates per worker task
+similarity_chunk = 0x10000  # fingerprints per popcount kernel call
+
+
+class SubstructureIndex:
+    """
+    Substructure search over molecules library.
+
+    Molecules screened by inverted index of substructure fingerprints: each fingerprint bit and each atom key count
+    threshold stored as bitmap of records. Candidates passed screening verified by isomorphism.
+
+    Index can be saved on disk and loaded with the same molecules source. Memory-mapped PACKRead is suitable for
+    huge libraries::
+
+        index = SubstructureIndex(PACKRead('data.pack'))
+        index.save('data.index')
+        ...
+        index = SubstructureIndex.load('data.index', PACKRead('data.pack'))
+        index.search(query, limit=100)
+
+    Molecules of library and queries should be in the same form, e.g. aromatized by `thiele()`.
+    """
+    __slots__ = ('_molecules', '_size', '_bits', '_counts', '_atoms', '_bonds', '_rings', '_stats')
+
+    def __init__(self, molecules: Iterable[MoleculeContainer]):
+        """
+        :param molecules: molecules library. Lists or PACKRead used as is for random access, other iterables loaded
+            into list.
+        """
+        if not isinstance(molecules, (Sequence, PACKRead)):
+            molecules = list(molecules)
+        bits = defaultdict(lambda: array('I'))
+        counts = defaultdict(lambda: array('I'))
+        stats = defaultdict(int)
+        self._atoms = atoms = array('H')
+        self._bonds = bonds = array('H')
+        self._rings = rings = array('H')
+
+        size = 0
+        for size, m in enumerate(molecules, start=1):
+            if not isinstance(m, MoleculeContainer):
+                raise TypeError('MoleculeContainer expected')
+            n = size - 1
+            b, c, a, bc, r = m._screen_fingerprint
+            for x in m._atoms_signatures.values():
+                stats[x] += 1
+            for x in range(screen_size + 1):
+                if b >> x & 1:
+                    bits[x].append(n)
+            for k, x in c.items():
+                for x in range(1, min(x, screen_counts) + 1):
+                    counts[(k, x)].append(n)
+            atoms.append(min(a, 0xffff))
+            bonds.append(min(bc, 0xffff))
+            rings.append(min(r, 0xffff))
+
+        self._molecules = molecules
+        self._size = size
+        self._bits = {k: self.__bitmap(v, size) for k, v in bits.items()}
+        self._counts = {k: self.__bitmap(v, size) for k, v in counts.items()}
+        self._stats = dict(stats)
+
+    def __len__(self):
+        return self._size
+
+    def search(self, query: Union[QueryContainer, MoleculeContainer], *, limit: Optional[int] = None,
+               workers: int = 1) -> List[int]:
+        """
+        Find records containing query. Query atoms matched in order of selectivity in library.
+
+        :param query: query or molecule
+        :param limit: maximal number of found records
+        :param workers: number of processes used for candidates verification
+        :return: sorted records indices
+        """
+        if limit is not None and limit < 1:
+            raise ValueError('limit should be positive')
+        candidates = self.screen(query)
+        if not candidates:
+            return []
+        plan = compile_query(query, self._stats)
+        if workers > 1 and len(candidates) > chunk_size:
+            chunks = [candidates[x: x + chunk_size] for x in range(0, len(candidates), chunk_size)]
+            found = []
+            with Pool(workers, _init_worker, (self._molecules, plan)) as p:
+                for x in p.imap(_verify, chunks):
+                    found.extend(x)
+                    if limit is not None and len(found) >= limit:
+                        break
+        else:
+            molecules = self._molecules
+            found = []
+            for n in candidates:
+                if next(plan.get_mapping(molecules[n]), None) is not None:
+                    found.append(n)
+                    if len(found) == limit:
+                        break
+        if limit is not None:
+            return found[:limit]
+        return found
+
+    def get_mapping(self, query: Union[QueryContainer, MoleculeContainer], n: int, **kwargs) -> \
+            Iterator[Dict[int, int]]:
+        """
+        Get query to record substructure mapping generator.
+
+        :param query: query or molecule
+        :param n: record index
+        """
+        return query.get_mapping(self._molecules[n], **kwargs)
+
+    def screen(self, query: Union[QueryContainer, MoleculeContainer]) -> List[int]:
+        """
+        Records indices passed fingerprints screening. Records can contain query.
+
+        :param query: query or molecule
+        """
+        if not isinstance(query, (QueryContainer, MoleculeContainer)):
+            raise TypeError('MoleculeContainer or QueryContainer expected')
+        b, c, a, bc, r = query._screen_fingerprint
+        if not self._size:
+            return []
+
+        masks = []
+        for x in range(screen_size + 1):
+            if b >> x & 1:
+                try:
+                    masks.append(self._bits[x])
+                except KeyError:  # not found in library
+                    return []
+        for k, x in c.items():
+            try:
+                masks.append(self._counts[(k, min(x, screen_counts))])
+            except KeyError:
+                return []
+
+        bitmap = (1 << self._size) - 1
+        for x in masks:
+            bitmap &= int.from_bytes(x, 'little')
+            if not bitmap:
+                return []
+
+        atoms = self._atoms
+        bonds = self._bonds
+        rings = self._rings
+        out = []
+        for i, x in enumerate(bitmap.to_bytes((self._size + 7) // 8, 'little')):
+            if x:
+                i *= 8
+                for j in range(8):
+                    if x >> j & 1:
+                        n = i + j
+                        if atoms[n] >= a and bonds[n] >= bc and rings[n] >= r:
+                            out.append(n)
+        return out
+
+    def save(self, file: Union[str, Path]):
+        """
+        Save index into file. Molecules not saved.
+        """
+        with open(file, 'wb') as f:
+            dump({'size': self._size, 'bits': self._bits, 'counts': self._counts, 'atoms': self._atoms,
+                  'bonds': self._bonds, 'rings': self._rings, 'stats': self._stats}, f)
+
+    @classmethod
+    def load(cls, file: Union[str, Path], molecules: Union[Sequence, PACKRead]) -> 'SubstructureIndex':
+        """
+        Load index from file.
+
+        :param molecules: the same molecules library used for index creation
+        """
+        with open(file, 'rb') as f:
+            state = load(f)
+        if len(molecules) != state['size']:
+            raise ValueError('molecules library and index sizes mismatch')
+        self = object.__new__(cls)
+        self._molecules = molecules
+        self._size = state['size']
+        self._bits = state['bits']
+        self._counts = state['counts']
+        self._atoms = state['atoms']
+        self._bonds = state['bonds']
+        self._rings = state['rings']
+        self._stats = state['stats']
+        return self
+
+    @staticmethod
+    def __bitmap(indices, size):
+        bitmap = bytearray((size + 7) // 8)
+        for n in indices:
+            bitmap[n >> 3] |= 1 << (n & 7)
+        return bytes(bitmap)
+
+
+class MoleculeHashIndex:
+    """
+    Exact match index of molecules, CGRs or reactions.
+
+    Structures keyed by Morgan order based invariant hash. Isomorphism used only for hash collisions.
+    Useful for deduplication of big libraries without SMILES generation::
+
+        index = MoleculeHashIndex()
+        unique = list(index.dedupe(SDFRead('data.sdf')))
+        index.save('data.hash')
+        ...
+        index = MoleculeHashIndex.load('data.hash')
+        index.contains(SDFRead('new.sdf'))
+
+    Structures should be in the same form, e.g. aromatized by `thiele()`. Stereo checked on collisions only.
+    """
+    __slots__ = ('_structures', '_hashes')
+
+    def __init__(self, structures: Iterable[Union[MoleculeContainer, CGRContainer, ReactionContainer]] = ()):
+        """
+        :param structures: initial structures. Duplicates ignored.
+        """
+        self._structures = []
+        self._hashes = {}
+        self.add(structures)
+
+    def __len__(self):
+        return len(self._structures)
+
+    def __getitem__(self, n: int) -> Union[MoleculeContainer, CGRContainer, ReactionContainer]:
+        return self._structures[n]
+
+    def __contains__(self, structure: Union[MoleculeContainer, CGRContainer, ReactionContainer]):
+        return self.index(structure) is not None
+
+    def index(self, structure: Union[MoleculeContainer, CGRContainer, ReactionContainer]) -> Optional[int]:
+        """
+        Record index of equal structure or None if not found.
+        """
+        return self.__index(structure, self.__hash(structure))
+
+    def add(self, structures: Iterable[Union[MoleculeContainer, CGRContainer, ReactionContainer]]) -> List[int]:
+        """
+        Add structures into index.
+
+        :return: records indices of given structures. Duplicates get index of first equal structure.
+        """
+        return [self.__add(x) for x in structures]
+
+    def contains(self, structures: Iterable[Union[MoleculeContainer, CGRContainer, ReactionContainer]]) -> List[bool]:
+        """
+        Test presence of each structure in index.
+        """
+        return [x in self for x in structures]
+
+    def dedupe(self, structures: Iterable[Union[MoleculeContainer, CGRContainer, ReactionContainer]]) -> \
+            Iterator[Union[MoleculeContainer, CGRContainer, ReactionContainer]]:
+        """
+        Filter stream of structures. Yield structures not found in index and add them into index.
+        """
+        size = len(self._structures)
+        for x in structures:
+            if self.__add(x) == size:
+                size += 1
+                yield x
+
+    def save(self, file: Union[str, Path]):
+        """
+        Save index with structures into file.
+        """
+        with open(file, 'wb') as f:
+            dump({'structures': self._structures, 'hashes': self._hashes}, f)
+
+    @classmethod
+    def load(cls, file: Union[str, Path]) -> 'MoleculeHashIndex':
+        """
+        Load index from file.
+        """
+        with open(file, 'rb') as f:
+            state = load(f)
+        self = object.__new__(cls)
+        self._structures = state['structures']
+        self._hashes = state['hashes']
+        return self
+
+    def __add(self, structure):
+        h = self.__hash(structure)
+        n = self.__index(structure, h)
+        if n is None:
+            n = len(self._structures)
+            self._structures.append(structure)
+            try:
+                self._hashes[h].append(n)
+            except KeyError:
+                self._hashes[h] = [n]
+        return n
+
+    def __index(self, structure, h):
+        try:
+            records = self._hashes[h]
+        except KeyError:
+            return
+        structures = self._structures
+        for n in records:
+            x = structures[n]
+            if type(x) is type(structure) and self.__equal(structure, x):
+                return n
+
+    @classmethod
+    def __hash(cls, structure) -> int:
+        if isinstance(structure, ReactionContainer):
+            return tuple_hash(tuple(tuple_hash(tuple(sorted(cls.__hash(m) for m in ms)))
+                                    for ms in (structure.reactants, structure.reagents, structure.products)))
+        elif isinstance(structure, MoleculeContainer):
+            # is_equal tests only self stereo presence in other. stereo counts make test symmetric
+            return tuple_hash((structure._canonical_hash, len(structure._atoms_stereo),
+                               len(structure._allenes_stereo), len(structure._cis_trans_stereo)))
+        elif isinstance(structure, CGRContainer):
+            return structure._canonical_hash
+        raise TypeError('MoleculeContainer, CGRContainer or ReactionContainer expected')
+
+    @classmethod
+    def __equal(cls, structure, other) -> bool:
+        if isinstance(structure, ReactionContainer):
+            for ms, os in ((structure.reactants, other.reactants), (structure.reagents, other.reagents),
+                           (structure.products, other.products)):
+                if len(ms) != len(os):
+                    return False
+                os = list(os)
+                for m in ms:  # equality is transitive. greedy matching is enough
+                    h = cls.__hash(m)
+                    for i, o in enumerate(os):
+                        if type(o) is type(m) and cls.__hash(o) == h and cls.__equal(m, o):
+                            del os[i]
+                            break
+                    else:
+                        return False
+            return True
+        # is_equal not used: Morgan weights based pruning can skip all stereo consistent mappings of symmetric graphs
+        if len(structure) != len(other) or not structure._screen(other):
+            return False
+        return next(structure.get_mapping(other, optimize=False), None) is not None
+
+
+class SimilarityIndex:
+    """
+    Similarity search over molecules, CGRs or reactions library by circular fingerprints.
+
+    Fingerprints stored as packed uint64 matrix sorted by bits counts. Tanimoto similarity calculated by popcount
+    of matrix chunks. Records groups with equal bits counts skipped by Tanimoto upper bound
+    min(a, b) / max(a, b) of bits counts a and b::
+
+        index = SimilarityIndex(SDFRead('data.sdf'))
+        index.search(molecule, k=10)  # 10 nearest neighbors
+        index.search(molecule, k=None, threshold=.7)  # all records with similarity >= .7
+        index.save('data.similarity')
+        ...
+        index = SimilarityIndex.load('data.similarity', PACKRead('data.pack'))
+
+    Library and queries should be in the same form, e.g. aromatized by `thiele()`.
+    """
+    __slots__ = ('_structures', '_fingerprints', '_popcounts', '_records', '_radius', '_size', '_center')
+
+    def __init__(self, structures: Iterable[Union[MoleculeContainer, CGRContainer, ReactionContainer]], *,
+                 radius: int = 2, size: int = 2048, center: bool = False):
+        """
+        :param structures: library. Lists or PACKRead used as is for random access, other iterables loaded into list.
+        :param radius: maximal radius of atoms environments
+        :param size: fingerprints length
+        :param center: use reaction center fingerprints of CGRs or reactions
+        """
+        if not isinstance(structures, (Sequence, PACKRead)):
+            structures = list(structures)
+        self._structures = structures
+        self._radius = radius
+        self._size = size
+        self._center = center
+        fingerprints = fingerprints_matrix((self.__check(x) for x in structures), radius, size, packed=True,
+                                           center=center)
+        popcounts = _popcount(fingerprints)
+        self._records = records = argsort(popcounts, kind='stable').astype(uint32)
+        self._fingerprints = fingerprints[records]
+        self._popcounts = popcounts[records]
+
+    def __len__(self):
+        return len(self._records)
+
+    def __getitem__(self, n: int) -> Union[MoleculeContainer, CGRContainer, ReactionContainer]:
+        return self._structures[n]
+
+    def search(self, query: Union[MoleculeContainer, CGRContainer, ReactionContainer], k: Optional[int] = 10, *,
+               threshold: Optional[float] = None, workers: int = 1) -> List[Tuple[int, float]]:
+        """
+        Find the most similar records.
+
+        :param query: molecule, CGR or reaction
+        :param k: maximal number of found records. All records passed threshold returned if None
+        :param threshold: minimal Tanimoto similarity of found records
+        :param workers: number of processes sharing library
+        :return: records indices and Tanimoto similarities sorted by decreasing similarity
+        """
+        if k is None:
+            if threshold is None:
+                raise ValueError('k or threshold required')
+        elif k < 1:
+            raise ValueError('k should be positive')
+        if threshold is not None and not 0 < threshold <= 1:
+            raise ValueError('threshold should be in (0, 1] range')
+
+        fingerprint = fingerprints_matrix([self.__check(query)], self._radius, self._size, packed=True,
+                                          center=self._center)
+        if workers > 1 and len(self._records) > similarity_chunk:
+            with Pool(workers, _init_similarity_worker, (self._fingerprints, self._popcounts)) as p:
+                found = p.starmap(_similarity_worker, [(fingerprint, k, threshold, x, workers) for x in range(workers)])
+            indices = concatenate([x for x, _ in found])
+            similarities = concatenate([x for _, x in found])
+            if k is not None and len(indices) > k:
+                top = argpartition(similarities, -k)[-k:]
+                indices, similarities = indices[top], similarities[top]
+        else:
+            indices, similarities = _similarity_search(self._fingerprints, self._popcounts, fingerprint, k, threshold)
+        records = self._records[indices]
+        order = lexsort((records, -similarities))
+        return [(int(records[x]), float(similarities[x])) for x in order]
+
+    def save(self, file: Union[str, Path]):
+        """
+        Save index into file. Library not saved.
+        """
+        with open(file, 'wb') as f:
+            dump({'fingerprints': self._fingerprints, 'popcounts': self._popcounts, 'records': self._records,
+                  'radius': self._radius, 'size': self._size, 'center': self._center}, f)
+
+    @classmethod
+    def load(cls, file: Union[str, Path], structures: Union[Sequence, PACKRead]):
+        """
+        Load index from file.
+
+        :param structures: the same library used for index creation
+        """
+        with open(file, 'rb') as f:
+            state = load(f)
+        if len(structures) != len(state['records']):
+            raise ValueError('library and index sizes mismatch')
+        self = object.__new__(cls)
+        self._structures = structures
+        self._fingerprints = state['fingerprints']
+        self._popcounts = state['popcounts']
+        self._records = state['records']
+        self._radius = state['radius']
+        self._size = state['size']
+        self._center = state['center']
+        return self
+
+    def __check(self, structure):
+        if self._center:
+            if not isinstance(structure, (ReactionContainer, CGRContainer)):
+                raise TypeError('ReactionContainer or CGRContainer expected')
+        elif not isinstance(structure, (MoleculeContainer, CGRContainer, ReactionContainer)):
+            raise TypeError('MoleculeContainer, CGRContainer or ReactionContainer expected')
+        return structure
+
+
+class ReactionSimilarityIndex(SimilarityIndex):
+    """
+    Similarity search over reactions library by reaction center fingerprints of CGRs::
+
+        index = ReactionSimilarityIndex(RDFRead('data.rdf'))
+        index.search(reaction, k=10)
+
+    Reactions should be mapped. Unmapped reactions have no centers in CGR.
+    """
+    __slots__ = ()
+
+    def __init__(self, reactions: Iterable[Union[ReactionContainer, CGRContainer]], *, radius: int = 2,
+                 size: int = 1024):
+        """
+        :param reactions: reactions or CGRs library. Lists or PACKRead used as is for random access, other iterables
+            loaded into list.
+        :param radius: maximal radius of center atoms environments
+        :param size: fingerprints length
+        """
+        super().__init__(reactions, radius=radius, size=size, center=True)
+
+
+def find_mcs(molecules: Iterable[MoleculeContainer], threshold: float = 1., *, timeout: Optional[float] = None,
+             workers: int = 1) -> Tuple[Optional[QueryContainer], Dict[int, Dict[int, int]]]:
+    """
+    Maximum common connected substructure shared by fraction of molecules set, e.g. scaffold of congeneric series::
+
+        core, mappings = find_mcs(molecules, threshold=.9, timeout=60)
+        core.get_mapping(molecule)
+
+    Core iteratively refined from reference molecule: core compared with all molecules by pairwise MCS and reduced
+    to common part with the worst of molecules required by threshold. Molecules already containing reduced core
+    skipped on next iterations. Result is heuristic for more than 2 molecules.
+
+    Molecules should be in the same form, e.g. aromatized by `thiele()`. Stereo ignored.
+
+    :param threshold: fraction of molecules which should contain core
+    :param timeout: search time limit in seconds. On expiry refinement stopped and current core returned: mappings
+        can cover less molecules than threshold requires
+    :param workers: number of processes used for pairwise searches
+    :return: core query without neighbors and hybridization marks and mappings of core atoms to atoms of
+        molecules containing core. None and empty dict if common bonds not found
+    """
+    if not 0 < threshold <= 1:
+        raise ValueError('threshold should be in (0, 1] range')
+    if timeout is not None and timeout <= 0:
+        raise ValueError('timeout should be positive')
+    molecules = list(molecules)
+    if not all(isinstance(m, MoleculeContainer) for m in molecules):
+        raise TypeError('MoleculeContainer expected')
+    if not molecules:
+        return None, {}
+
+    required = ceil(threshold * len(molecules))
+    # at least required molecules should be not smaller than core
+    reference = sorted(range(len(molecules)), key=lambda x: len(molecules[x]))[len(molecules) - required]
+    graphs = [m._mcs_graph for m in molecules]
+    labels, bonds = graphs[reference]
+    deadline = None if timeout is None else monotonic() + timeout
+
+    core = set(labels)
+    mappings = {reference: {n: n for n in core}}
+    pool = Pool(workers, _init_mcs_worker, (graphs,)) if workers > 1 else None
+    try:
+        while True:
+            tasks = [n for n in range(len(molecules)) if n not in mappings or not core.issubset(mappings[n])]
+            if tasks:
+                core_labels = {n: a for n, a in labels.items() if n in core}  # order of atoms kept
+                core_bonds = {n: {m: b for m, b in bonds[n].items() if m in core} for n in core}
+                if pool is not None:  # monotonic clock is system-wide. workers share deadline
+                    found = pool.map(_mcs_worker, [(core_labels, core_bonds, n, deadline) for n in tasks])
+                else:
+                    found = [_mcs_search(core_labels, core_bonds, graphs[n], deadline) for n in tasks]
+                expired = False
+                for n, (mapping, interrupted) in zip(tasks, found):
+                    mappings[n] = dict(mapping)
+                    expired |= interrupted
+                if expired:  # truncated searches can't reduce core
+                    break
+
+            # molecule closing required fraction
+            _, mapping = sorted(mappings.items(), key=lambda x: -len(x[1]))[required - 1]
+            if len(mapping) == len(core):
+                break
+            if len(mapping) < 2:
+                return None, {}
+            core = set(mapping)
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    query = molecules[reference].substructure(core, as_query=True)
+    query._neighbors = {n: () for n in core}
+    query._hybridizations = {n: () for n in core}
+    query._atoms_stereo = {}
+    query._allenes_stereo = {}
+    query._cis_trans_stereo = {}
+    return query, {n: {k: v for k, v in mapping.items() if k in core} for n, mapping in mappings.items()
+                   if core.issubset(mapping)}
+
+
+def _similarity_search(fingerprints, popcounts, fingerprint, k, threshold, shard=0, shards=1):
+    """
+    Top-k or threshold search in fingerprints sorted by popcounts.
+    Groups of equal popcount processed in order of similarity upper bound. Shard takes its part of each group.
+
+    :return: rows indices and similarities
+    """
+    count = int(_popcount(fingerprint)[0])
+    counts, starts = unique(popcounts, return_index=True)
+    stops = append(starts[1:], len(popcounts))
+    bounds = minimum(counts, count) / maximum(maximum(counts, count), 1)
+
+    indices = []
+    similarities = []
+    found = 0
+    kth = -1.  # lowest similarity in top-k
+    for g in argsort(-bounds, kind='stable'):
+        bound = bounds[g]
+        if threshold is not None and bound < threshold or found == k and kth >= bound:
+            break  # rest groups can't improve result
+        size = stops[g] - starts[g]
+        first = starts[g] + size * shard // shards
+        last = starts[g] + size * (shard + 1) // shards
+        for start in range(first, last, similarity_chunk):
+            stop = min(start + similarity_chunk, last)
+            common = _popcount(fingerprints[start:stop] & fingerprint)
+            chunk = common / maximum(popcounts[start:stop] + count - common, 1)
+            rows = arange(start, stop)
+            if threshold is not None:
+                mask = chunk >= threshold
+                chunk = chunk[mask]
+                rows = rows[mask]
+            indices.append(rows)
+            similarities.append(chunk)
+            found += len(rows)
+            if k is not None and found >= k:
+                rows = concatenate(indices)
+                chunk = concatenate(similarities)
+                top = argpartition(chunk, -k)[-k:]
+                indices = [rows[top]]
+                similarities = [chunk[top]]
+                found = k
+                kth = chunk[top].min()
+    if not indices:
+        return arange(0), zeros(0)
+    return concatenate(indices), concatenate(similarities)
+
+
+def _init_similarity_worker(fingerprints, popcounts):
+    global _fingerprints, _popcounts
+    _fingerprints = fingerprints
+    _popcounts = popcounts
+
+
+def _similarity_worker(fingerprint, k, threshold, shard, shards):
+    return _similarity_search(_fingerprints, _popcounts, fingerprint, k, threshold, shard, shards)
+
+
+def _popcount(fingerprints):
+    """
+    Bits counts of packed uint64 fingerprints rows.
+    """
+    if bitwise_count is not None:
+        return bitwise_count(fingerprints).sum(axis=1, dtype=uint32)
+    return popcount_table[fingerprints.view(uint8)].sum(axis=1, dtype=uint32)
+
+
+def _init_worker(molecules, plan):
+    global _molecules, _plan
+    _molecules = molecules
+    _plan = plan
+
+
+def _verify(candidates):
+    return [n for n in candidates if next(_plan.get_mapping(_molecules[n]), None) is not None]
+
+
+def _mcs_search(labels, bonds, graph, deadline):
+    """
+    MCS of core with molecule graph and interruption flag.
+    """
+    if deadline is None:
+        return MCS._mcs(labels, bonds, *graph), False
+    timeout = deadline - monotonic()
+    if timeout <= 0:
+        return [], True
+    budget = SearchBudget(timeout, partial=True)
+    return MCS._mcs(labels, bonds, *graph, budget), budget.expired is not None
+
+
+def _init_mcs_worker(graphs):
+    global _graphs
+    _graphs = graphs
+
+
+def _mcs_worker(task):
+    labels, bonds, n, deadline = task
+    return _mcs_search(labels, bonds, _graphs[n], deadline)
+
+
+__all__ = ['SubstructureIndex', 'MoleculeHashIndex', 'QueryPlan', 'QuerySet', 'SearchBudget', 'compile_query',
+           'collect_statistics', 'find_mcs']
+if find_spec('numpy'):
+    __all__.extend(('SimilarityIndex', 'ReactionSimilarityIndex', 'fingerprints_matrix'))
@@ -121,14 +121,14 @@ def to_rdkit_molecule(data: MoleculeContainer):
     mapping = {}
     bonds = data._bonds
 
-    for n, a in data.atoms():
-        ra = Atom(a.atomic_number)
+    for n, atomic_number, isotope, charge, is_radical, *_ in data.iter_atom_records():
+        ra = Atom(atomic_number)
         ra.SetAtomMapNum(n)
-        if a.charge:
-            ra.SetFormalCharge(a.charge)
-        if a.isotope:
-            ra.SetIsotope(a.isotope)
-        if a.is_radical:
+        if charge:
+            ra.SetFormalCharge(charge)
+        if isotope:
+            ra.SetIsotope(isotope)
+        if is_radical:
             ra.SetNumRadicalElectrons(1)
         mapping[n] = mol.AddAtom(ra)
 
@@ -150,8 +150,8 @@ def to_rdkit_molecule(data: MoleculeContainer):
             b.SetStereo(_cis if s else _trans)
 
     conf = Conformer()
-    for n, a in data.atoms():
-        conf.SetAtomPosition(mapping[n], (a.x, a.y, 0))
+    for n, (x, y) in data._plane.items():
+        conf.SetAtomPosition(mapping[n], (x, y, 0))
     conf.Set3D(False)
     mol.AddConformer(conf, assignId=True)
 